@@ -0,0 +1,174 @@
+from argparse import SUPPRESS, ArgumentParser
+import json
+import os
+import resource
+import subprocess
+import sys
+from time import perf_counter
+
+import homework
+
+CASES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "actual-test-cases")
+ALGORITHMS = ("BFS", "UCS", "A*")
+
+
+def route_cost(mountain: homework.Mountain, algo, line):
+    # cost of one output line under algo's rules, None if the route is not
+    # a legal one. FAIL lines cost "FAIL" so they compare equal to each other
+    line = line.strip()
+    if line == "FAIL":
+        return "FAIL"
+
+    nodes = []
+    for token in line.split():
+        x, y = (int(value) for value in token.split(","))
+        nodes.append(mountain.node_at(y, x))
+
+    total = 0
+    momentum = 0
+    for node, child in zip(nodes, nodes[1:]):
+        costs = dict(mountain.children(node))
+        if child not in costs:
+            return None
+        node_value, child_value = mountain.value(node), mountain.value(child)
+        if algo == "A*":
+            if not homework.is_valid_move(child_value, node_value, mountain.stamina, momentum):
+                return None
+            total += costs[child] + \
+                homework.calc_elevation_cost(child_value, node_value, momentum)
+            momentum = max(0, abs(node_value) - abs(child_value))
+        else:
+            if abs(child_value) - abs(node_value) > mountain.stamina:
+                return None
+            total += 1 if algo == "BFS" else costs[child]
+    return total
+
+
+def run_case(input_path, output_path, algo=None, compact=False, landmarks=0, landmark_dir="."):
+    # runs in a fresh process so ru_maxrss belongs to this case alone
+    report = {"case": os.path.basename(input_path)}
+
+    started = perf_counter()
+    case_algo, fields = homework.parse_input(input_path, compact)
+    parsed = perf_counter()
+    mountain_class = homework.GridMountain if compact else homework.Mountain
+    mountain = mountain_class(**fields)
+    built = perf_counter()
+
+    algo = algo or case_algo
+    stats = {"expanded": 0, "frontier_peak": 0}
+    if algo == "A*":
+        if landmarks:
+            mountain.load_landmarks(landmarks, landmark_dir)
+        mountain.calculate_heuristics()
+    prepared = perf_counter()
+    paths = homework.func_map[algo](mountain, stats=stats)
+    searched = perf_counter()
+
+    lines = [line.rstrip() for line in homework.format_paths(paths)]
+    report.update({
+        "algorithm": algo,
+        "parse_seconds": parsed - started,
+        "build_seconds": built - parsed,
+        "heuristic_seconds": prepared - built,
+        "search_seconds": searched - prepared,
+        "wall_seconds": searched - started,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "expanded": stats["expanded"],
+        "frontier_peak": stats["frontier_peak"],
+    })
+
+    # outputN.txt is only an answer for the algorithm the case asks for
+    if algo == case_algo and os.path.exists(output_path):
+        with open(output_path, "r") as f:
+            expected = [line.rstrip() for line in f.read().splitlines()]
+        report["matches"] = lines == expected
+        costs = [route_cost(mountain, algo, line) for line in lines]
+        report["cost_matches"] = None not in costs and costs == [
+            route_cost(mountain, algo, line) for line in expected]
+    return report
+
+
+def summarize(reports):
+    summary = {}
+    for report in reports:
+        totals = summary.setdefault(report["algorithm"], {
+            "cases": 0, "matches": 0, "cost_matches": 0, "checked": 0,
+            "wall_seconds": 0.0, "build_seconds": 0.0, "search_seconds": 0.0,
+            "expanded": 0, "frontier_peak": 0, "peak_rss_kb": 0})
+        totals["cases"] += 1
+        if "matches" in report:
+            totals["checked"] += 1
+            totals["matches"] += report["matches"]
+            totals["cost_matches"] += report["cost_matches"]
+        for key in ("wall_seconds", "build_seconds", "search_seconds", "expanded"):
+            totals[key] += report[key]
+        for key in ("frontier_peak", "peak_rss_kb"):
+            totals[key] = max(totals[key], report[key])
+    return summary
+
+
+def case_numbers(cases_dir):
+    numbers = []
+    for name in os.listdir(cases_dir):
+        if name.startswith("input") and name.endswith(".txt"):
+            numbers.append(int(name[len("input"):-len(".txt")]))
+    return sorted(numbers)
+
+
+def main():
+    parser = ArgumentParser(description="benchmark bfs/ucs/a_star on the hw1 test cases")
+    parser.add_argument("--cases", default=CASES_DIR,
+                        help="directory holding inputN.txt / outputN.txt pairs")
+    parser.add_argument("--all-algorithms", action="store_true",
+                        help="run every case with BFS, UCS and A*, not just its own algorithm")
+    parser.add_argument("--compact", action="store_true",
+                        help="benchmark the GridMountain representation")
+    parser.add_argument("--landmarks", type=int, default=0, metavar="K")
+    parser.add_argument("--landmark-dir", default=".")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--worker", nargs=3, metavar=("INPUT", "OUTPUT", "ALGO"),
+                        help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        input_path, output_path, algo = args.worker
+        print(json.dumps(run_case(input_path, output_path, algo, args.compact,
+                                  args.landmarks, args.landmark_dir)))
+        return
+
+    reports = []
+    for number in case_numbers(args.cases):
+        input_path = os.path.join(args.cases, f"input{number}.txt")
+        output_path = os.path.join(args.cases, f"output{number}.txt")
+        with open(input_path, "r") as f:
+            case_algo = f.readline().strip()
+
+        for algo in (ALGORITHMS if args.all_algorithms else (case_algo,)):
+            command = [sys.executable, os.path.abspath(__file__),
+                       "--worker", input_path, output_path, algo,
+                       "--landmarks", str(args.landmarks), "--landmark-dir", args.landmark_dir]
+            if args.compact:
+                command.append("--compact")
+            started = perf_counter()
+            result = subprocess.run(command, capture_output=True, text=True)
+            if result.returncode:
+                reports.append({"case": os.path.basename(input_path), "algorithm": algo,
+                                "error": result.stderr.strip().splitlines()[-1:]})
+                continue
+            report = json.loads(result.stdout)
+            report["process_seconds"] = perf_counter() - started
+            reports.append(report)
+
+    completed = [report for report in reports if "error" not in report]
+    document = json.dumps({"compact": args.compact, "landmarks": args.landmarks,
+                           "summary": summarize(completed), "cases": reports}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(document + "\n")
+    else:
+        print(document)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
+from argparse import ArgumentParser
+from array import array
 from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import copy
-from heapq import heapify
+import gc
+import hashlib
+from heapq import heappop, heappush
+from itertools import compress
+import json
 from math import sqrt
-from queue import PriorityQueue
+from multiprocessing.shared_memory import SharedMemory
+import os
+import socketserver
+import sys
+from threading import Lock
+from time import perf_counter
 
 directions = {
     (-1, 0): 10,
@@ -17,10 +29,11 @@ directions = {
 
 
 class Node:
+    __slots__ = ("value", "coords", "children")
+
     def __init__(self, value, coords) -> None:
         self.value = value
         self.coords = coords
-        self.momentum = 0
         self.children = []
 
     def __lt__(self, _):
@@ -35,242 +48,1457 @@ class Mountain:
         self.no_of_lodges = no_of_lodges
         self.lodges = lodges
         self.terrain_map = terrain_map
+        # per-terrain caches, shared by every query view of this mountain
+        self.distances = {}
+        self.landmarks = None
+        self.hierarchies = {}
+        self.build()
+        self.locate()
 
-        # create a graph
-        self.graph = {}
-
-        for j in range(dim[0]):
-            for i in range(dim[1]):
-                self.graph[(i, j)] = Node(self.terrain_map[i][j], (i, j))
+    def build(self):
+        width, height = self.dim
 
-        for j in range(dim[0]):
-            for i in range(dim[1]):
-                for k, l in directions.keys():
-                    if ((i + k) >= 0 and (j + l) >= 0 and (i + k) <= (dim[1] - 1) and (j + l) <= (dim[0] - 1)):
-                        fut_elevation = self.terrain_map[i+k][j+l]
-                        curr_elevation = abs(self.terrain_map[i][j])
+        # the graph is millions of long-lived objects; pausing the cyclic
+        # collector while it is built keeps it from rescanning them
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            # create a graph
+            nodes = [[Node(value, (i, j)) for j, value in enumerate(row)]
+                     for i, row in enumerate(self.terrain_map)]
+            self.graph = {node.coords: node for row in nodes for node in row}
 
-                        if (not (fut_elevation < 0 and abs(fut_elevation) > curr_elevation)):
-                            self.graph[(i, j)].children.append(
-                                (self.graph[(i + k, j + l)], directions.get((k, l))))
+            moves = list(directions.items())
+            for direction, i, j, mask in passable_moves(self.terrain_map.__getitem__, width, height):
+                (k, l), cost = moves[direction]
+                for node, child in compress(zip(nodes[i][j:], nodes[i + k][j + l:]), mask):
+                    node.children.append((child, cost))
+        finally:
+            if collecting:
+                gc.enable()
 
+    def locate(self):
         self.start_node = self.graph[(self.start[1], self.start[0])]
         self.end_nodes = [self.graph[(y, x)] for x, y in self.lodges]
 
+    def with_query(self, start, stamina, lodges):
+        # shallow copy that shares the graph and caches but answers a
+        # different start/stamina/lodges query. coordinates are checked here
+        # since a flat index off the side of the grid wraps onto the next row
+        width, height = self.dim
+        for x, y in [start] + list(lodges):
+            if not (0 <= x < width and 0 <= y < height):
+                raise ValueError(f"{x},{y} is outside the {width}x{height} terrain")
+        mountain = copy.copy(self)
+        mountain.start = start
+        mountain.stamina = stamina
+        mountain.no_of_lodges = len(lodges)
+        mountain.lodges = lodges
+        mountain.locate()
+        return mountain
+
+    def node_at(self, i, j):
+        return self.graph[(i, j)]
+
+    def children(self, node):
+        return node.children
+
+    def value(self, node):
+        return node.value
+
+    def coords(self, node):
+        return node.coords
+
+    def neighbours(self, node):
+        # every in-bounds neighbour with its direction cost, cliffs included
+        i, j = node.coords
+        neighbours = []
+        for (k, l), cost in directions.items():
+            neighbour = self.graph.get((i + k, j + l))
+            if neighbour is not None:
+                neighbours.append((neighbour, cost))
+        return neighbours
+
+    def parents(self, node):
+        # cells with a move into node; direction costs are symmetric
+        node_value = self.value(node)
+        return [(parent, cost) for parent, cost in self.neighbours(node)
+                if is_passable(node_value, self.value(parent))]
+
+    def set_elevations(self, changes):
+        # changes maps (i, j) to a new elevation. returns the cells whose
+        # incoming or outgoing moves may have changed: the changed cells and
+        # their neighbours. caches built from the old terrain are dropped.
+        touched = set()
+        for (i, j), value in changes.items():
+            node = self.node_at(i, j)
+            self.set_value(node, value)
+            touched.add(node)
+            touched.update(neighbour for neighbour, _ in self.neighbours(node))
+        self.relink(touched)
+        self.landmarks = None
+        self.hierarchies.clear()
+        return touched
+
+    def set_value(self, node, value):
+        i, j = node.coords
+        self.terrain_map[i][j] = value
+        node.value = value
+
+    def relink(self, nodes):
+        for node in nodes:
+            node_value = abs(node.value)
+            node.children = [(child, cost) for child, cost in self.neighbours(node)
+                             if is_passable(child.value, node_value)]
+
+    def load_landmarks(self, count, directory="."):
+        self.landmarks = Landmarks.load_or_build(self, count, directory)
+
+    def hierarchy(self, algo, cluster_size, exact):
+        key = (algo, self.stamina, cluster_size, exact)
+        if key not in self.hierarchies:
+            self.hierarchies[key] = Hierarchy(
+                self, algo, cluster_size, exact)
+        return self.hierarchies[key]
+
     def calculate_heuristics(self):
+        # one lazily filled offset table shared by every lodge
         self.heuristics = {}
         for end_node in self.end_nodes:
-            self.heuristics[end_node] = {}
-            for coords, _ in self.graph.items():
-                self.heuristics[end_node][coords] = round(
-                    sqrt(
-                        pow(10 * coords[0] - 10 * end_node.coords[0], 2) +
-                        pow(10 * coords[1] - 10 * end_node.coords[1], 2))
-                )
+            if self.landmarks is None:
+                self.heuristics[end_node] = Heuristic(
+                    self.coords(end_node), self.distances)
+            else:
+                self.heuristics[end_node] = LandmarkHeuristic(
+                    self.coords(end_node), self.distances, self.landmarks)
+
+
+def passable_moves(row, width, height):
+    # yields (direction index, i, j, mask) where mask[n] tells whether the
+    # move from (i, j + n) in that direction is allowed. every row is
+    # compared with its shifted neighbour row in one pass, so bounds are
+    # handled by the slices instead of per cell. row(i) returns row i.
+    for i in range(height):
+        curr_elevations = [abs(value) for value in row(i)]
+        for direction, (k, l) in enumerate(directions):
+            if not 0 <= i + k < height:
+                continue
+            start, stop = max(0, -l), min(width, width - l)
+            fut_elevations = row(i + k)[start + l:stop + l]
+            yield direction, i, start, [
+                not (fut_elevation < 0 and -fut_elevation > curr_elevation)
+                for curr_elevation, fut_elevation in zip(curr_elevations[start:stop], fut_elevations)]
+
+
+class Heuristic:
+    # straight-line distance to one lodge, looked up as heuristic[coords].
+    # the value only depends on the row/column offset, so it is computed on
+    # first use and cached in a table shared across lodges.
+    def __init__(self, end_coords, distances):
+        self.end_coords = end_coords
+        self.distances = distances
+
+    def __getitem__(self, coords):
+        offset = (abs(coords[0] - self.end_coords[0]),
+                  abs(coords[1] - self.end_coords[1]))
+        distance = self.distances.get(offset)
+        if distance is None:
+            distance = round(
+                sqrt(pow(10 * offset[0], 2) + pow(10 * offset[1], 2)))
+            self.distances[offset] = distance
+        return distance
+
+
+class LandmarkHeuristic(Heuristic):
+    # max of the straight-line distance and the landmark triangle bounds
+    # d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L)
+    def __init__(self, end_coords, distances, landmarks: "Landmarks"):
+        super().__init__(end_coords, distances)
+        self.landmarks = landmarks
+        end_index = landmarks.index(end_coords)
+        self.landmark_to_end = [table[end_index] for table in landmarks.forward]
+        self.end_to_landmark = [table[end_index] for table in landmarks.backward]
+
+    def __getitem__(self, coords):
+        distance = super().__getitem__(coords)
+        index = self.landmarks.index(coords)
+        for k in range(self.landmarks.count):
+            from_landmark = self.landmarks.forward[k][index]
+            if from_landmark >= 0 and self.landmark_to_end[k] >= 0:
+                distance = max(distance, self.landmark_to_end[k] - from_landmark)
+            to_landmark = self.landmarks.backward[k][index]
+            if to_landmark >= 0 and self.end_to_landmark[k] >= 0:
+                distance = max(distance, to_landmark - self.end_to_landmark[k])
+        return distance
+
+
+class GridMountain(Mountain):
+    # nodes are flat indexes (i * width + j) into one elevation buffer and
+    # children are generated on demand from the directions table. an
+    # existing buffer (e.g. a view of shared memory) can be passed as
+    # elevations instead of a terrain_map.
+    def __init__(self, dim, start, stamina, no_of_lodges, lodges, terrain_map, elevations=None) -> None:
+        self.elevations = elevations
+        super().__init__(dim, start, stamina, no_of_lodges, lodges, terrain_map)
+
+    def build(self):
+        self.width, self.height = self.dim
+        self.size = self.width * self.height
+
+        if self.elevations is None:
+            low = min(min(row) for row in self.terrain_map)
+            high = max(max(row) for row in self.terrain_map)
+            typecode = 'i'
+            for code in ('b', 'h'):
+                bits = array(code).itemsize * 8
+                if low >= -(1 << (bits - 1)) and high < (1 << (bits - 1)):
+                    typecode = code
+                    break
+
+            self.elevations = array(typecode)
+            for row in self.terrain_map:
+                # rows may be lists or array('i') rows from parse_input, and
+                # extend only takes an array of the same typecode
+                self.elevations.fromlist(list(row))
+        # drop the list-of-lists copy, the buffer is all the searches need
+        self.terrain_map = None
+
+        self.moves = [(k, l, k * self.width + l, cost)
+                      for (k, l), cost in directions.items()]
+
+    def locate(self):
+        self.start_node = self.start[1] * self.width + self.start[0]
+        self.end_nodes = [y * self.width + x for x, y in self.lodges]
+
+    def node_at(self, i, j):
+        return i * self.width + j
+
+    def children(self, node):
+        i, j = divmod(node, self.width)
+        elevations = self.elevations
+        curr_elevation = abs(elevations[node])
+        children = []
+        for k, l, offset, cost in self.moves:
+            if 0 <= i + k < self.height and 0 <= j + l < self.width:
+                fut_elevation = elevations[node + offset]
+                if (not (fut_elevation < 0 and abs(fut_elevation) > curr_elevation)):
+                    children.append((node + offset, cost))
+        return children
+
+    def value(self, node):
+        return self.elevations[node]
+
+    def neighbours(self, node):
+        i, j = divmod(node, self.width)
+        return [(node + offset, cost) for k, l, offset, cost in self.moves
+                if 0 <= i + k < self.height and 0 <= j + l < self.width]
+
+    def set_value(self, node, value):
+        try:
+            self.elevations[node] = value
+        except OverflowError:
+            # the new elevation does not fit the narrow typecode
+            self.elevations = array('i', self.elevations)
+            self.elevations[node] = value
+
+    def relink(self, nodes):
+        # children are generated on demand, nothing is stored per cell
+        pass
+
+    def coords(self, node):
+        return divmod(node, self.width)
+
+
+class Landmarks:
+    # exact distances from and to K landmark cells on a relaxed terrain that
+    # keeps the cliff rule and charges every step its direction cost plus
+    # the smallest elevation cost any momentum could leave. that relaxation
+    # does not depend on stamina or the query, so the tables are per terrain
+    # and are cached on disk next to the input. -1 marks unreachable cells.
+    def __init__(self, width, height, elevations, count):
+        self.width = width
+        self.height = height
+        self.count = count
+        self.landmarks = []
+        self.forward = []
+        self.backward = []
+        self.elevations = elevations
+
+    @staticmethod
+    def load_or_build(mountain: Mountain, count, directory):
+        width, height = mountain.dim
+        elevations = array('i', (mountain.value(mountain.node_at(i, j))
+                                 for i in range(height) for j in range(width)))
+        landmarks = Landmarks(width, height, elevations, count)
+
+        digest = terrain_digest(mountain.dim, [elevations])
+        path = os.path.join(directory, f"landmarks-{digest}-{count}.bin")
+        # a file another run is still writing, or left cut short, is rebuilt
+        if not (os.path.exists(path) and landmarks.read(path)):
+            landmarks.build()
+            landmarks.write(path)
+        landmarks.elevations = None
+        return landmarks
+
+    def index(self, coords):
+        return coords[0] * self.width + coords[1]
+
+    def build(self):
+        width, height = self.width, self.height
+        elevations = [abs(elevation) for elevation in self.elevations]
+        size = width * height
+
+        # outgoing[u] / incoming[v] hold (neighbour, direction cost) pairs
+        outgoing = [[] for _ in range(size)]
+        incoming = [[] for _ in range(size)]
+        for u in range(size):
+            i, j = divmod(u, width)
+            for (k, l), cost in directions.items():
+                if 0 <= i + k < height and 0 <= j + l < width:
+                    v = u + k * width + l
+                    fut_elevation = self.elevations[v]
+                    if (not (fut_elevation < 0 and abs(fut_elevation) > elevations[u])):
+                        outgoing[u].append((v, cost))
+                        incoming[v].append((u, cost))
+
+        # largest momentum a skier can carry into each cell
+        momentum = [max([elevations[p] - elevations[u] for p, _ in incoming[u]] + [0])
+                    for u in range(size)]
+
+        def weight(u, v, cost):
+            return cost + max(0, elevations[v] - elevations[u] - momentum[u])
+
+        for landmark in self.select():
+            self.landmarks.append(landmark)
+            self.forward.append(self.sweep(landmark, outgoing, weight))
+            self.backward.append(self.sweep(
+                landmark, incoming, lambda v, u, cost: weight(u, v, cost)))
+        self.count = len(self.landmarks)
+
+    def select(self):
+        # planar farthest-point selection over open ground (trees can wall
+        # a cell off, open cells are enterable from every neighbour): start
+        # at the open cell furthest from the centre, then keep taking the
+        # open cell furthest from every landmark picked so far
+        open_cells = [cell for cell in range(self.width * self.height)
+                      if self.elevations[cell] >= 0]
+        if not open_cells:
+            open_cells = list(range(self.width * self.height))
+
+        centre = (self.height // 2, self.width // 2)
+        nearest = {cell: self.spread(cell, centre) for cell in open_cells}
+        landmarks = []
+        while len(landmarks) < min(self.count, len(open_cells)):
+            landmark = max(open_cells, key=nearest.__getitem__)
+            landmarks.append(landmark)
+            coords = divmod(landmark, self.width)
+            for cell in open_cells:
+                spread = self.spread(cell, coords)
+                if len(landmarks) == 1 or spread < nearest[cell]:
+                    nearest[cell] = spread
+        return landmarks
+
+    def spread(self, cell, coords):
+        i, j = divmod(cell, self.width)
+        return (i - coords[0]) ** 2 + (j - coords[1]) ** 2
+
+    def sweep(self, source, edges, weight):
+        distances = array('i', [-1]) * (self.width * self.height)
+        frontier = [(0, source)]
+        while frontier:
+            distance, u = heappop(frontier)
+            if distances[u] >= 0:
+                continue
+            distances[u] = distance
+            for v, cost in edges[u]:
+                if distances[v] < 0:
+                    heappush(frontier, (distance + weight(u, v, cost), v))
+        return distances
+
+    def read(self, path):
+        # False, with nothing loaded, when the file does not hold a whole table
+        size = self.width * self.height
+        table = array('i')
+        try:
+            with open(path, "rb") as f:
+                table.frombytes(f.read())
+        except (OSError, ValueError):
+            return False
+        if not table or len(table) != 2 * table[0] * size + table[0] + 1:
+            return False
+        self.count = table[0]
+        self.landmarks = list(table[1:self.count + 1])
+        offset = self.count + 1
+        for tables in (self.forward, self.backward):
+            for _ in range(self.count):
+                tables.append(table[offset:offset + size])
+                offset += size
+        return True
+
+    def write(self, path):
+        table = array('i', [self.count] + self.landmarks)
+        for distances in self.forward + self.backward:
+            table.extend(distances)
+        # written under a temporary name so readers never see half a table
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            table.tofile(f)
+        os.replace(temp, path)
+
+
+class Hierarchy:
+    # HPA*-style abstraction for one algorithm and stamina. the terrain is cut
+    # into cluster_size x cluster_size clusters and the abstract nodes are
+    # crossings, moves (x, y) from a cell in one cluster to a neighbour in
+    # another. since momentum only depends on the cell we came from, a
+    # crossing fixes the state we enter the next cluster in, so abstract
+    # edge costs (entry crossing -> exit crossing, via a search confined to
+    # the cluster) stay exact under the stamina and momentum rules. by default
+    # every crossing is kept and routes cost what the flat search finds; with
+    # exact=False only the middle straight crossing of each entrance is kept,
+    # as in HPA*, which builds faster but can return dearer routes.
+    def __init__(self, mountain: Mountain, algo, cluster_size=16, exact=True):
+        self.mountain = mountain
+        self.algo = algo
+        self.stamina = mountain.stamina
+        self.cluster_size = cluster_size
+        self.exact = exact
+        self.entries = {}
+        self.exits = {}
+        self.edges = {}
+        self.build()
+
+    def cluster(self, node):
+        i, j = self.mountain.coords(node)
+        return (i // self.cluster_size, j // self.cluster_size)
+
+    def step(self, node_value, child_value, cost, momentum):
+        # (cost, momentum on arrival) of one move, None if it is not allowed
+        if self.algo == "A*":
+            if not is_valid_move(child_value, node_value, self.stamina, momentum):
+                return None
+            return (cost + calc_elevation_cost(child_value, node_value, momentum),
+                    max(0, abs(node_value) - abs(child_value)))
+        if abs(child_value) - abs(node_value) > self.stamina:
+            return None
+        return (1 if self.algo == "BFS" else cost), 0
+
+    def arrival_momentum(self, crossing):
+        if self.algo != "A*":
+            return 0
+        x, y = crossing
+        return max(0, abs(self.mountain.value(x)) - abs(self.mountain.value(y)))
+
+    def build(self):
+        mountain = self.mountain
+        crossings = []
+        for i in range(mountain.dim[1]):
+            for j in range(mountain.dim[0]):
+                node = mountain.node_at(i, j)
+                for child, cost in mountain.children(node):
+                    if self.cluster(child) != self.cluster(node):
+                        crossings.append((node, child, cost))
+        if not self.exact:
+            crossings = self.entrances(crossings)
+
+        for x, y, _ in crossings:
+            self.exits.setdefault(self.cluster(x), []).append((x, y))
+            self.entries.setdefault(self.cluster(y), []).append((x, y))
+
+        for cluster, entries in self.entries.items():
+            # crossings into the same cell with the same momentum share a
+            # local search, every crossing is kept so there are many of them
+            searches = {}
+            for entry in entries:
+                state = (entry[1], self.arrival_momentum(entry))
+                if state not in searches:
+                    searches[state] = self.local_search(*state)[0]
+                labels = searches[state]
+                self.edges[entry] = []
+                for exit in self.exits.get(cluster, []):
+                    move = self.exit_cost(labels, exit)
+                    if move is not None:
+                        self.edges[entry].append((exit, move[0]))
+
+    def entrances(self, crossings):
+        # keep the middle straight crossing of every run of neighbouring
+        # straight crossings between the same two clusters
+        runs = {}
+        for x, y, cost in crossings:
+            if cost != 10:
+                continue
+            (xi, xj), (yi, yj) = self.mountain.coords(x), self.mountain.coords(y)
+            position = xj if xi != yi else xi
+            runs.setdefault((self.cluster(x), self.cluster(y)), []).append(
+                (position, (x, y, cost)))
+
+        kept = []
+        for run in runs.values():
+            run.sort(key=lambda item: item[0])
+            start = 0
+            for k in range(1, len(run) + 1):
+                if k == len(run) or run[k][0] != run[k - 1][0] + 1:
+                    kept.append(run[(start + k - 1) // 2][1])
+                    start = k
+        return kept
+
+    def local_search(self, source, momentum):
+        # Dijkstra over (node, momentum) states that never leave the cluster
+        # of source, pruned with the same labels as a_star
+        mountain = self.mountain
+        cluster = self.cluster(source)
+        frontier = IndexedPriorityQueue()
+        frontier.put((0, (source, momentum)))
+        labels = {source: [(momentum, 0)]}
+        parent = {}
+
+        while frontier.qsize() != 0:
+            path_cost, state = frontier.get()
+            node, node_momentum = state
+            if (node_momentum, path_cost) not in labels[node]:
+                continue
+
+            node_value = mountain.value(node)
+            for child, cost in mountain.children(node):
+                if self.cluster(child) != cluster:
+                    continue
+                move = self.step(node_value, mountain.value(child), cost, node_momentum)
+                if move is None:
+                    continue
+
+                child_state = (child, move[1])
+                child_path_cost = path_cost + move[0]
+                if not add_label(labels, child_state, child_path_cost):
+                    continue
+                if child_state in frontier:
+                    frontier.change_priority(child_state, child_path_cost)
+                else:
+                    frontier.put((child_path_cost, child_state))
+                parent[child_state] = state
+
+        return labels, parent
+
+    def exit_cost(self, labels, crossing):
+        # cheapest (cost, momentum at x) for leaving through crossing, the
+        # cost includes the move from x to y
+        x, y = crossing
+        x_value = self.mountain.value(x)
+        y_value = self.mountain.value(y)
+        (xi, xj), (yi, yj) = self.mountain.coords(x), self.mountain.coords(y)
+        cost = directions[(yi - xi, yj - xj)]
+        best = None
+        for momentum, path_cost in labels.get(x, []):
+            move = self.step(x_value, y_value, cost, momentum)
+            if move is not None and (best is None or path_cost + move[0] < best[0]):
+                best = (path_cost + move[0], momentum)
+        return best
+
+    def route(self, start_node, end_node):
+        end_cluster = self.cluster(end_node)
+        start_labels, _ = self.local_search(start_node, 0)
+
+        best_cost, best_crossing = None, None
+        if end_node in start_labels:
+            best_cost = min(path_cost for _, path_cost in start_labels[end_node])
+
+        goal_costs = {}
+        searches = {}
+        for entry in self.entries.get(end_cluster, []):
+            state = (entry[1], self.arrival_momentum(entry))
+            if state not in searches:
+                searches[state] = self.local_search(*state)[0]
+            labels = searches[state]
+            if end_node in labels:
+                goal_costs[entry] = min(
+                    path_cost for _, path_cost in labels[end_node])
+
+        frontier = IndexedPriorityQueue()
+        explored = set()
+        parent = {}
+        for exit in self.exits.get(self.cluster(start_node), []):
+            move = self.exit_cost(start_labels, exit)
+            if move is not None:
+                frontier.put((move[0], exit))
+
+        while frontier.qsize() != 0:
+            path_cost, crossing = frontier.get()
+            if best_cost is not None and path_cost >= best_cost:
+                break
+            explored.add(crossing)
+
+            if crossing in goal_costs and (
+                    best_cost is None or path_cost + goal_costs[crossing] < best_cost):
+                best_cost = path_cost + goal_costs[crossing]
+                best_crossing = crossing
+
+            for next_crossing, cost in self.edges.get(crossing, []):
+                if next_crossing in explored:
+                    continue
+                if next_crossing in frontier:
+                    if frontier.change_priority(next_crossing, path_cost + cost):
+                        parent[next_crossing] = crossing
+                else:
+                    frontier.put((path_cost + cost, next_crossing))
+                    parent[next_crossing] = crossing
 
+        if best_cost is None:
+            return None
+
+        chain = deque()
+        crossing = best_crossing
+        while crossing is not None:
+            chain.appendleft(crossing)
+            crossing = parent.get(crossing)
+        return self.refine(start_node, end_node, chain)
+
+    def refine(self, start_node, end_node, chain):
+        # expand every abstract hop back into cells with a local search
+        nodes = []
+        source, momentum = start_node, 0
+        for crossing in chain:
+            labels, parent = self.local_search(source, momentum)
+            _, exit_momentum = self.exit_cost(labels, crossing)
+            nodes.extend(trace(parent, (crossing[0], exit_momentum)))
+            source, momentum = crossing[1], self.arrival_momentum(crossing)
+
+        labels, parent = self.local_search(source, momentum)
+        _, end_momentum = min((path_cost, end_momentum)
+                              for end_momentum, path_cost in labels[end_node])
+        nodes.extend(trace(parent, (end_node, end_momentum)))
+        return deque(self.mountain.coords(node) for node in nodes)
+
+
+def trace(parent, state):
+    nodes = deque()
+    while state in parent:
+        nodes.appendleft(state[0])
+        state = parent[state]
+    nodes.appendleft(state[0])
+    return nodes
+
+
+class IndexedPriorityQueue:
+    # binary min-heap that keeps the heap position of every node, so
+    # decrease-key sifts from a known slot and membership is a dict lookup.
+    # entries are (priority..., node) tuples; a decreasing insertion counter
+    # sits in front of the node so ties never compare nodes and go to the
+    # most recently queued one, as they did with Node.__lt__.
+    def __init__(self):
+        self.heap = []
+        self.position = {}
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, node):
+        return node in self.position
+
+    def qsize(self):
+        return len(self.heap)
+
+    def put(self, entry):
+        self.counter -= 1
+        self.heap.append(entry[:-1] + (self.counter, entry[-1]))
+        self.position[entry[-1]] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def get(self):
+        heap = self.heap
+        last = heap.pop()
+        if heap:
+            top = heap[0]
+            heap[0] = last
+            self.position[last[-1]] = 0
+            self._sift_down(0)
+        else:
+            top = last
+        del self.position[top[-1]]
+        return top[:-2] + (top[-1],)
+
+    def peek(self):
+        top = self.heap[0]
+        return top[:-2] + (top[-1],)
+
+    def remove(self, item):
+        heap = self.heap
+        index = self.position.pop(item)
+        last = heap.pop()
+        if index < len(heap):
+            heap[index] = last
+            self.position[last[-1]] = index
+            self._sift_up(index)
+            self._sift_down(self.position[last[-1]])
 
-class MyPriorityQueue(PriorityQueue):
     def change_priority(self, item, priority, actual_cost=0):
-        for index in range(len(self.queue)):
-            if actual_cost:
-                if (self.queue[index][2] == item):
-                    if (priority < self.queue[index][0] or (
-                            priority == self.queue[index][0] and actual_cost < self.queue[index][1])):
-                        self.queue[index] = (priority, actual_cost, item)
-                        heapify(self.queue)
-                        return True
-            else:
-                if (self.queue[index][1] == item):
-                    if (priority < self.queue[index][0]):
-                        self.queue[index] = (priority, item)
-                        heapify(self.queue)
-                        return True
-        return False
-
-
-def read_input():
-    with open("input.txt", "r") as f:
-        file = f.read().splitlines()
-
-    search_algo = file[0]
-    dim = tuple(int(x) for x in file[1].split(" "))
-    start = tuple(int(x) for x in file[2].split(" "))
-    stamina = int(file[3])
-    no_of_lodges = int(file[4])
-    lodges = []
-
-    for line in file[5:no_of_lodges+5]:
-        lodges.append(tuple(int(x) for x in line.split(" ")))
-
-    terrain_map = []
-    for line in file[no_of_lodges+5:]:
-        terrain_map.append([int(x) for x in line.split(" ")])
-
-    return search_algo, Mountain(
-        dim=dim,
-        start=start,
-        stamina=stamina,
-        no_of_lodges=no_of_lodges,
-        lodges=lodges,
-        terrain_map=terrain_map
-    )
-
-
-def bfs(mountain: Mountain):
+        index = self.position.get(item)
+        if index is None:
+            return False
+
+        entry = self.heap[index]
+        if actual_cost:
+            if not (priority < entry[0] or (priority == entry[0] and actual_cost < entry[1])):
+                return False
+            self.heap[index] = (priority, actual_cost, entry[-2], item)
+        else:
+            if not priority < entry[0]:
+                return False
+            self.heap[index] = (priority, entry[-2], item)
+
+        self._sift_up(index)
+        return True
+
+    def _sift_up(self, index):
+        heap = self.heap
+        position = self.position
+        entry = heap[index]
+        while index > 0:
+            parent = (index - 1) >> 1
+            if not entry < heap[parent]:
+                break
+            heap[index] = heap[parent]
+            position[heap[index][-1]] = index
+            index = parent
+        heap[index] = entry
+        position[entry[-1]] = index
+
+    def _sift_down(self, index):
+        heap = self.heap
+        position = self.position
+        size = len(heap)
+        entry = heap[index]
+        child = 2 * index + 1
+        while child < size:
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if not heap[child] < entry:
+                break
+            heap[index] = heap[child]
+            position[heap[index][-1]] = index
+            index = child
+            child = 2 * index + 1
+        heap[index] = entry
+        position[entry[-1]] = index
+
+
+def parse_input(path="input.txt", compact=False):
+    # the file is read a line at a time and every terrain row goes straight
+    # into a typed array, so no copy of the whole file or of the map as
+    # python ints is ever held. compact inputs come back as one flat
+    # elevations buffer for GridMountain, otherwise as a list of row arrays.
+    with open(path, "r") as f:
+        search_algo = f.readline().strip()
+        dim = tuple(int(x) for x in f.readline().split())
+        start = tuple(int(x) for x in f.readline().split())
+        stamina = int(f.readline())
+        no_of_lodges = int(f.readline())
+        lodges = []
+
+        for _ in range(no_of_lodges):
+            lodges.append(tuple(int(x) for x in f.readline().split()))
+
+        fields = dict(
+            dim=dim,
+            start=start,
+            stamina=stamina,
+            no_of_lodges=no_of_lodges,
+            lodges=lodges,
+            terrain_map=None
+        )
+        if compact:
+            fields["elevations"] = read_elevations(f)
+        else:
+            fields["terrain_map"] = [array('i', (int(x) for x in line.split()))
+                                     for line in f if line.strip()]
+
+    return search_algo, fields
+
+
+def read_elevations(lines):
+    # starts with one byte per cell and widens the buffer only when a row
+    # does not fit, fromlist leaves the array untouched when it fails
+    elevations = array('b')
+    for line in lines:
+        row = [int(x) for x in line.split()]
+        while True:
+            try:
+                elevations.fromlist(row)
+                break
+            except OverflowError:
+                if elevations.typecode == 'i':
+                    raise
+                elevations = array('h' if elevations.typecode == 'b' else 'i', elevations)
+    return elevations
+
+
+class BucketQueue:
+    # Dial's circular bucket queue for integer priorities that never run more
+    # than max_cost ahead of the smallest queued one, so priority p can live
+    # in bucket p % (max_cost + 1). there is no decrease-key: callers push the
+    # node again and skip the stale entry when it comes out.
+    def __init__(self, max_cost):
+        self.size = max_cost + 1
+        self.buckets = [[] for _ in range(self.size)]
+        self.current = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def qsize(self):
+        return self.count
+
+    def put(self, priority, item):
+        self.buckets[priority % self.size].append(item)
+        self.count += 1
+
+    def get(self):
+        bucket = self.buckets[self.current % self.size]
+        while not bucket:
+            self.current += 1
+            bucket = self.buckets[self.current % self.size]
+        self.count -= 1
+        return self.current, bucket.pop()
+
+
+def build_path(mountain: Mountain, parent, node):
+    path = deque()
+    while node in parent:
+        path.appendleft(mountain.coords(node))
+        node = parent[node]
+    path.appendleft(mountain.coords(node))
+    return path
+
+
+def record_expansion(stats, frontier_size):
+    stats["expanded"] = stats.get("expanded", 0) + 1
+    if frontier_size > stats.get("frontier_peak", 0):
+        stats["frontier_peak"] = frontier_size
+
+
+def record_event(stats, counter):
+    stats[counter] = stats.get(counter, 0) + 1
+
+
+def snapshot(stats, started):
+    # the counters so far, taken when a lodge gets its answer
+    counters = {counter: stats.get(counter, 0) for counter in
+                ("expanded", "generated", "decrease_key", "copies", "frontier_peak")}
+    counters["search_seconds"] = perf_counter() - started
+    return counters
+
+
+def record_lodge(stats, mountain: Mountain, end_node, counters, path_started):
+    i, j = mountain.coords(end_node)
+    counters["lodge"] = [j, i]
+    counters["path_seconds"] = perf_counter() - path_started
+    stats.setdefault("lodges", []).append(counters)
+
+
+def record_phase(stats, phase, started):
+    # adds the time since started to phase and returns the current time,
+    # so consecutive phases can be chained
+    now = perf_counter()
+    if stats is not None:
+        timings = stats.setdefault("timings", {})
+        timings[phase] = timings.get(phase, 0) + now - started
+    return now
+
+
+def write_stats(stats):
+    if stats is not None:
+        with open("stats.json", "w") as f:
+            json.dump(stats, f, indent=2)
+            f.write("\n")
+
+
+def bfs(mountain: Mountain, stats=None):
+    # the traversal never looks at the target, so one pass from start_node
+    # serves every lodge: each lodge keeps the parent it was first reached
+    # from, exactly as in a dedicated search for it.
     start_node = mountain.start_node
     end_nodes = mountain.end_nodes
+    remaining = set(end_nodes)
     paths = OrderedDict()
 
+    frontier = deque([start_node])
+    reached = set([start_node])
+    parent = {}
+    if stats is not None:
+        started = perf_counter()
+        answered = {}
+
+    while len(frontier) and remaining:
+        if stats is not None:
+            record_expansion(stats, len(frontier))
+        node = frontier.popleft()
+        node_value = abs(mountain.value(node))
+        for child, _ in mountain.children(node):
+            elevation = abs(mountain.value(child)) - node_value
+            if child not in reached and elevation <= mountain.stamina:
+                parent[child] = node
+                reached.add(child)
+                frontier.append(child)
+                if child in remaining:
+                    remaining.discard(child)
+                    if stats is not None:
+                        stats["generated"] = len(reached) - 1
+                        answered[child] = snapshot(stats, started)
+
+    if stats is not None:
+        # every cell is generated once, when it is first reached
+        stats["generated"] = len(reached) - 1
     for end_node in end_nodes:
-        frontier = deque([start_node])
-        reached = set([start_node])
-        explored = set()
-        parent = {}
+        if stats is not None:
+            counters = answered.get(end_node) or snapshot(stats, started)
+            path_started = perf_counter()
+        # the start is never reached as a child, so a lodge on it fails
+        if end_node in parent:
+            paths[mountain.coords(end_node)] = build_path(
+                mountain, parent, end_node)
+        else:
+            paths[mountain.coords(end_node)] = "FAIL"
+        if stats is not None:
+            record_lodge(stats, mountain, end_node, counters, path_started)
+
+    return paths
+
+
+def ucs(mountain: Mountain, stats=None):
+    # single traversal shared by all lodges, stopping once every lodge has
+    # been settled. paths of explored nodes never change afterwards.
+    start_node = mountain.start_node
+    end_nodes = mountain.end_nodes
+    remaining = set(end_nodes)
+    paths = OrderedDict()
+
+    frontier = IndexedPriorityQueue()
+    frontier.put((0, start_node))
+    reached = set([start_node])
+    explored = set()
+    parent = {}
+    if stats is not None:
+        started = perf_counter()
+        answered = {}
 
-        while len(frontier):
-            node = frontier.popleft()
-            for child, _ in node.children:
-                elevation = abs(child.value) - abs(node.value)
-                if child not in explored and child not in reached and elevation <= mountain.stamina:
+    while frontier.qsize() != 0:
+        if stats is not None:
+            record_expansion(stats, frontier.qsize())
+        node_path_cost, node = frontier.get()
+        explored.add(node)
+
+        if node in remaining:
+            remaining.discard(node)
+            if stats is not None:
+                stats["generated"] = len(reached) - 1
+                answered[node] = snapshot(stats, started)
+            if not remaining:
+                break
+
+        node_value = abs(mountain.value(node))
+        for child, cost in mountain.children(node):
+            child_path_cost = node_path_cost + cost
+            elevation = abs(mountain.value(child)) - node_value
+            if child not in explored and child not in reached and elevation <= mountain.stamina:
+                parent[child] = node
+                reached.add(child)
+                frontier.put((child_path_cost, child))
+            elif child not in explored and child in reached:
+                if stats is not None:
+                    record_event(stats, "decrease_key")
+                if frontier.change_priority(child, child_path_cost):
                     parent[child] = node
-                    reached.add(child)
-                    if child == end_node:
-                        path = deque()
-                        while parent.get(child):
-                            path.appendleft(child.coords)
-                            child = parent.get(child)
-                        path.appendleft(child.coords)
-                        # add path for end_node
-                        paths[end_node.coords] = path
-                        break
-
-                    frontier.append(child)
-            explored.add(node)
-
-        if paths.get(end_node.coords) is None:
-            paths[end_node.coords] = "FAIL"
+
+    if stats is not None:
+        # a cell is generated once, when it is first reached
+        stats["generated"] = len(reached) - 1
+    for end_node in end_nodes:
+        if stats is not None:
+            counters = answered.get(end_node) or snapshot(stats, started)
+            path_started = perf_counter()
+        if end_node in explored:
+            paths[mountain.coords(end_node)] = build_path(
+                mountain, parent, end_node)
+        else:
+            paths[mountain.coords(end_node)] = "FAIL"
+        if stats is not None:
+            record_lodge(stats, mountain, end_node, counters, path_started)
 
     return paths
 
 
-def ucs(mountain: Mountain):
+def a_star(mountain: Mountain, stats=None):
+    # search states are (node, momentum) pairs: momentum only depends on the
+    # cell we arrived from, so every cell has at most a handful of states.
+    # labels[node] holds the (momentum, g) pairs of the states still worth
+    # expanding; a state is pruned when another state of the same cell has
+    # at least its momentum for at most its cost.
     start_node = mountain.start_node
     end_nodes = mountain.end_nodes
     paths = OrderedDict()
 
     for end_node in end_nodes:
-        frontier = MyPriorityQueue()
-        frontier.put((0, start_node))
-        reached = set([start_node])
-        explored = set()
+        end_coords = mountain.coords(end_node)
+        heuristics = mountain.heuristics[end_node]
+        start_state = (start_node, 0)
+        frontier = IndexedPriorityQueue()
+        frontier.put((0, 0, start_state))
+        labels = {start_node: [(0, 0)]}
         parent = {}
+        goal = None
+        # every lodge is its own search, so it gets its own counters. states
+        # are (node, momentum) tuples, nothing is copied to carry momentum
+        lodge = None
+        if stats is not None:
+            lodge = {"copies": 0}
+            started = perf_counter()
 
         while frontier.qsize() != 0:
-            node_path_cost, node = frontier.get()
+            _, node_path_cost, state = frontier.get()
+            node, momentum = state
+
+            # dominated by a state found after this one was queued
+            if (momentum, node_path_cost) not in labels[node]:
+                continue
+            if lodge is not None:
+                record_expansion(lodge, frontier.qsize() + 1)
 
             if node == end_node:
-                path = deque()
-                while (parent.get(node)):
-                    path.appendleft(node.coords)
-                    node = parent.get(node)
-                path.appendleft(node.coords)
-                # add path for end_node
-                paths[end_node.coords] = path
-
-            for child, cost in node.children:
-                child_path_cost = node_path_cost + cost
-                elevation = abs(child.value) - abs(node.value)
-                if child not in explored and child not in reached and elevation <= mountain.stamina:
-                    parent[child] = node
-                    reached.add(child)
-                    frontier.put((child_path_cost, child))
-                elif child not in explored and child in reached:
-                    if frontier.change_priority(child, child_path_cost):
-                        parent[child] = node
+                goal = state
+                break
 
-            explored.add(node)
+            node_value = mountain.value(node)
+            for child, cost in mountain.children(node):
+                child_value = mountain.value(child)
+                if not is_valid_move(child_value, node_value, mountain.stamina, momentum):
+                    continue
 
-        if paths.get(end_node.coords) is None:
-            paths[end_node.coords] = "FAIL"
+                child_state = (child, max(0, abs(node_value) - abs(child_value)))
+                child_path_cost = node_path_cost + cost + \
+                    calc_elevation_cost(child_value, node_value, momentum)
+                if not add_label(labels, child_state, child_path_cost):
+                    continue
+
+                priority = child_path_cost + heuristics[mountain.coords(child)]
+                if child_state in frontier:
+                    if lodge is not None:
+                        record_event(lodge, "decrease_key")
+                    frontier.change_priority(
+                        child_state, priority, child_path_cost)
+                else:
+                    if lodge is not None:
+                        record_event(lodge, "generated")
+                    frontier.put((priority, child_path_cost, child_state))
+                parent[child_state] = state
+
+        if lodge is not None:
+            counters = snapshot(lodge, started)
+            path_started = perf_counter()
+        if goal is not None:
+            # add path for end_node
+            state = goal
+            path = deque()
+            while state in parent:
+                path.appendleft(mountain.coords(state[0]))
+                state = parent[state]
+            path.appendleft(mountain.coords(state[0]))
+            paths[end_coords] = path
+        elif paths.get(end_coords) is None:
+            paths[end_coords] = "FAIL"
+
+        if lodge is not None:
+            record_lodge(stats, mountain, end_node, counters, path_started)
+            for counter in ("expanded", "generated", "decrease_key", "copies"):
+                stats[counter] = stats.get(counter, 0) + lodge.get(counter, 0)
+            stats["frontier_peak"] = max(
+                stats.get("frontier_peak", 0), lodge.get("frontier_peak", 0))
 
     return paths
 
 
-def a_star(mountain: Mountain):
+# terrain attached by each parallel_a_star worker process
+worker_mountain = None
+
+
+def attach_terrain(name, typecode, dim, stamina, landmarks, landmark_dir):
+    global worker_mountain
+    # keep the SharedMemory object alive as long as the view into it
+    shared = SharedMemory(name=name)
+    worker_mountain = GridMountain(
+        dim=dim, start=(0, 0), stamina=stamina, no_of_lodges=0, lodges=[],
+        terrain_map=None, elevations=shared.buf.cast(typecode))
+    worker_mountain.shared = shared
+    if landmarks:
+        worker_mountain.load_landmarks(landmarks, landmark_dir)
+
+
+def a_star_lodge(start, lodge):
+    mountain = worker_mountain.with_query(
+        start, worker_mountain.stamina, [lodge])
+    mountain.calculate_heuristics()
+    path = a_star(mountain)[mountain.coords(mountain.end_nodes[0])]
+    return path if path == "FAIL" else list(path)
+
+
+def parallel_a_star(mountain: Mountain, processes, landmarks=0, landmark_dir="."):
+    # lodges are independent A* searches, so they are spread over a process
+    # pool. the elevations go to the workers once through shared memory and
+    # every worker searches a GridMountain over that buffer.
+    if isinstance(mountain, GridMountain):
+        elevations = mountain.elevations
+    else:
+        elevations = array('i', (mountain.value(mountain.node_at(i, j))
+                                 for i in range(mountain.dim[1]) for j in range(mountain.dim[0])))
+    if landmarks:
+        # build or refresh the on-disk tables once, workers only read them
+        mountain.load_landmarks(landmarks, landmark_dir)
+
+    shared = SharedMemory(create=True, size=max(1, len(elevations) * elevations.itemsize))
+    try:
+        shared.buf[:len(elevations) * elevations.itemsize] = elevations.tobytes()
+        with ProcessPoolExecutor(
+                max_workers=processes, initializer=attach_terrain,
+                initargs=(shared.name, elevations.typecode, mountain.dim,
+                          mountain.stamina, landmarks, landmark_dir)) as executor:
+            results = list(executor.map(
+                a_star_lodge, [mountain.start] * len(mountain.lodges), mountain.lodges))
+    finally:
+        shared.close()
+        shared.unlink()
+
+    paths = OrderedDict()
+    for end_node, path in zip(mountain.end_nodes, results):
+        paths[mountain.coords(end_node)] = path if path == "FAIL" else deque(path)
+    return paths
+
+
+def hierarchical(mountain: Mountain, algo, cluster_size=16, exact=True):
+    # answers algo's query on the cluster abstraction, see Hierarchy
+    hierarchy = mountain.hierarchy(algo, cluster_size, exact)
+    paths = OrderedDict()
+
+    for end_node in mountain.end_nodes:
+        end_coords = mountain.coords(end_node)
+        # bfs never reaches its own start, keep answering FAIL for it
+        if algo == "BFS" and end_node == mountain.start_node:
+            paths[end_coords] = "FAIL"
+            continue
+
+        path = hierarchy.route(mountain.start_node, end_node)
+        if path is None and not exact:
+            # sparse entrances can miss the only way through, so a FAIL is
+            # only trusted from the exact abstraction
+            path = mountain.hierarchy(algo, cluster_size, True).route(
+                mountain.start_node, end_node)
+        paths[end_coords] = "FAIL" if path is None else path
+
+    return paths
+
+
+def dial(mountain: Mountain, stats=None):
+    # UCS answered with Dial's algorithm: moves cost 10 or 14, so a bucket
+    # queue of 15 buckets replaces the heap. one pass serves every lodge.
     start_node = mountain.start_node
     end_nodes = mountain.end_nodes
+    remaining = set(end_nodes)
     paths = OrderedDict()
 
+    frontier = BucketQueue(max(directions.values()))
+    frontier.put(0, start_node)
+    path_costs = {start_node: 0}
+    explored = set()
+    parent = {}
+
+    while frontier.qsize() != 0:
+        node_path_cost, node = frontier.get()
+        if node in explored or node_path_cost > path_costs[node]:
+            continue
+        explored.add(node)
+        if stats is not None:
+            record_expansion(stats, frontier.qsize() + 1)
+
+        if node in remaining:
+            remaining.discard(node)
+            if not remaining:
+                break
+
+        node_value = abs(mountain.value(node))
+        for child, cost in mountain.children(node):
+            child_path_cost = node_path_cost + cost
+            if child in explored or abs(mountain.value(child)) - node_value > mountain.stamina:
+                continue
+            if child not in path_costs or child_path_cost < path_costs[child]:
+                path_costs[child] = child_path_cost
+                parent[child] = node
+                frontier.put(child_path_cost, child)
+
     for end_node in end_nodes:
-        frontier = MyPriorityQueue()
-        frontier.put((0, 0, start_node))
-        reached = set([start_node])
-        explored = set()
-        parent = {}
+        if end_node in explored:
+            paths[mountain.coords(end_node)] = build_path(
+                mountain, parent, end_node)
+        else:
+            paths[mountain.coords(end_node)] = "FAIL"
 
-        while frontier.qsize() != 0:
-            _, node_path_cost, node = frontier.get()
+    return paths
 
-            if node == end_node:
-                path = deque()
-                while (parent.get(node)):
-                    path.appendleft(node.coords)
-                    node = parent.get(node)
-                path.appendleft(node.coords)
-                # add path for end_node
-                paths[end_node.coords] = path
-
-            for child, cost in node.children:
-                child_path_cost = node_path_cost + cost + \
-                    mountain.heuristics[end_node][child.coords]
 
-                momentum = max(0, abs(node.value) - abs(child.value))
+def dial_a_star(mountain: Mountain, stats=None):
+    # the A* cost model (momentum, elevation costs) searched with Dial's
+    # algorithm over (node, momentum) states. an uphill move is only legal
+    # when its elevation cost is at most stamina, so no move costs more than
+    # 14 + stamina. without a heuristic the search is target independent
+    # and one pass serves every lodge.
+    start_node = mountain.start_node
+    end_nodes = mountain.end_nodes
+    remaining = set(end_nodes)
+    paths = OrderedDict()
+
+    start_state = (start_node, 0)
+    frontier = BucketQueue(max(directions.values()) + mountain.stamina)
+    frontier.put(0, start_state)
+    labels = {start_node: [(0, 0)]}
+    parent = {}
+    settled = {}
 
-                if child in explored and momentum > child.momentum:
-                    child = copy.copy(child)
+    while frontier.qsize() != 0:
+        node_path_cost, state = frontier.get()
+        node, momentum = state
+        if (momentum, node_path_cost) not in labels[node]:
+            continue
+        if stats is not None:
+            record_expansion(stats, frontier.qsize() + 1)
 
-                if child not in explored and child not in reached and is_valid_move(child, node, mountain.stamina):
-                    parent[child] = node
-                    child.momentum = momentum
-                    child_path_cost += calc_elevation_cost(child, node)
-                    reached.add(child)
-                    frontier.put(
-                        (child_path_cost, node_path_cost + cost, child))
-                elif child not in explored and child in reached:
-                    if frontier.change_priority(child, child_path_cost, node_path_cost + cost):
-                        parent[child] = node
+        if node in remaining:
+            remaining.discard(node)
+            settled[node] = state
+            if not remaining:
+                break
 
-            explored.add(node)
+        node_value = mountain.value(node)
+        for child, cost in mountain.children(node):
+            child_value = mountain.value(child)
+            if not is_valid_move(child_value, node_value, mountain.stamina, momentum):
+                continue
 
-        if paths.get(end_node.coords) is None:
-            paths[end_node.coords] = "FAIL"
+            child_state = (child, max(0, abs(node_value) - abs(child_value)))
+            child_path_cost = node_path_cost + cost + \
+                calc_elevation_cost(child_value, node_value, momentum)
+            if add_label(labels, child_state, child_path_cost):
+                parent[child_state] = state
+                frontier.put(child_path_cost, child_state)
+
+    for end_node in end_nodes:
+        end_coords = mountain.coords(end_node)
+        if end_node not in settled:
+            paths[end_coords] = "FAIL"
+            continue
+        path = deque()
+        state = settled[end_node]
+        while state in parent:
+            path.appendleft(mountain.coords(state[0]))
+            state = parent[state]
+        path.appendleft(mountain.coords(state[0]))
+        paths[end_coords] = path
 
     return paths
 
 
-def is_valid_move(child: Node, parent: Node, stamina):
-    curr_elevation = abs(parent.value)
-    future_elevation = abs(child.value)
+class IncrementalSearch:
+    # LPA* (D* Lite with a fixed start) for the BFS and UCS cost models.
+    # g holds the cost a cell was last expanded with and rhs the best cost
+    # offered by its parents' g; a cell is queued while the two disagree.
+    # after the terrain changes only the cells next to the change get a new
+    # rhs, so the repair re-expands just the part of the search tree the
+    # change reaches. there is no heuristic, so one search serves every lodge.
+    def __init__(self, mountain: Mountain, algo):
+        self.mountain = mountain
+        self.algo = algo
+        self.g = {}
+        self.rhs = {mountain.start_node: 0}
+        self.frontier = IndexedPriorityQueue()
+        self.frontier.put((0, mountain.start_node))
+
+    def step(self, node, child, cost):
+        # cost of the move node -> child, None when stamina forbids it
+        mountain = self.mountain
+        if abs(mountain.value(child)) - abs(mountain.value(node)) > mountain.stamina:
+            return None
+        return 1 if self.algo == "BFS" else cost
+
+    def update_vertex(self, node):
+        if node != self.mountain.start_node:
+            best = None
+            for parent, cost in self.mountain.parents(node):
+                step = self.step(parent, node, cost)
+                if step is not None and parent in self.g and (
+                        best is None or self.g[parent] + step < best):
+                    best = self.g[parent] + step
+            if best is None:
+                self.rhs.pop(node, None)
+            else:
+                self.rhs[node] = best
+        self.queue(node)
+
+    def queue(self, node):
+        if node in self.frontier:
+            self.frontier.remove(node)
+        g, rhs = self.g.get(node), self.rhs.get(node)
+        if g != rhs:
+            self.frontier.put((min(cost for cost in (g, rhs) if cost is not None), node))
+
+    def settled(self, key):
+        # every lodge is consistent and nothing cheaper is left to expand
+        for end_node in self.mountain.end_nodes:
+            g = self.g.get(end_node)
+            if g != self.rhs.get(end_node) or g is None or key < g:
+                return False
+        return True
+
+    def compute(self, stats=None):
+        mountain = self.mountain
+        while self.frontier.qsize() != 0:
+            key, node = self.frontier.peek()
+            if self.settled(key):
+                break
+            if stats is not None:
+                record_expansion(stats, self.frontier.qsize())
+            self.frontier.get()
+
+            g, rhs = self.g.get(node), self.rhs.get(node)
+            if rhs is not None and (g is None or g > rhs):
+                # the cell got cheaper, which can only lower its children's
+                # rhs, so they are relaxed without rescanning their parents
+                self.g[node] = rhs
+                for child, cost in mountain.children(node):
+                    step = self.step(node, child, cost)
+                    if step is not None and child != mountain.start_node and (
+                            child not in self.rhs or rhs + step < self.rhs[child]):
+                        self.rhs[child] = rhs + step
+                        self.queue(child)
+            else:
+                # the cell got more expensive, so it and everything that
+                # leaned on it has to be looked at again
+                del self.g[node]
+                self.update_vertex(node)
+                for child, _ in mountain.children(node):
+                    self.update_vertex(child)
+
+    def update(self, changes, stats=None):
+        for node in self.mountain.set_elevations(changes):
+            self.update_vertex(node)
+        self.compute(stats)
+
+    def paths(self):
+        mountain = self.mountain
+        start_node = mountain.start_node
+        paths = OrderedDict()
+        for end_node in mountain.end_nodes:
+            end_coords = mountain.coords(end_node)
+            # bfs never reaches its own start, keep answering FAIL for it
+            if end_node not in self.g or (self.algo == "BFS" and end_node == start_node):
+                paths[end_coords] = "FAIL"
+                continue
+
+            path = deque([end_coords])
+            node = end_node
+            while node != start_node:
+                best = None
+                for parent, cost in mountain.parents(node):
+                    step = self.step(parent, node, cost)
+                    if step is not None and parent in self.g and (
+                            best is None or self.g[parent] + step < best[0]):
+                        best = (self.g[parent] + step, parent)
+                node = best[1]
+                path.appendleft(mountain.coords(node))
+            paths[end_coords] = path
+        return paths
+
+
+def parse_updates(path, dim):
+    # batches of "x y elevation" lines, separated by blank lines. every cell
+    # is checked against dim up front, a flat index off the side of the grid
+    # would wrap onto another cell
+    width, height = dim
+    batches = [{}]
+    with open(path, "r") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                if batches[-1]:
+                    batches.append({})
+                continue
+            x, y, value = (int(token) for token in line.split())
+            if not (0 <= x < width and 0 <= y < height):
+                raise ValueError(f"{path}:{number}: {x},{y} is outside the {width}x{height} terrain")
+            batches[-1][(y, x)] = value
+    return [batch for batch in batches if batch]
+
+
+def replan(mountain: Mountain, algo, path, compare=False):
+    # answers the query once, then repairs it after every batch of updates,
+    # printing how many cells the repair expanded. with compare a fresh
+    # search is also run per batch to print what it would have expanded
+    batches = parse_updates(path, mountain.dim)
+    search = IncrementalSearch(mountain, algo)
+    search.compute()
+    for number, changes in enumerate(batches, 1):
+        stats = {"expanded": 0}
+        search.update(changes, stats)
+        report = {"batch": number, "changed": len(changes), "expanded": stats["expanded"]}
+        if compare:
+            full_stats = {"expanded": 0}
+            func_map[algo](mountain, stats=full_stats)
+            report["full_expanded"] = full_stats["expanded"]
+        print(json.dumps(report))
+    return search.paths()
+
+
+def add_label(labels, state, path_cost):
+    # record (momentum, path_cost) for state's node unless an existing label
+    # dominates it, dropping the labels it dominates in turn
+    node, momentum = state
+    node_labels = labels.get(node)
+    if node_labels is None:
+        labels[node] = [(momentum, path_cost)]
+        return True
+
+    for label_momentum, label_cost in node_labels:
+        if label_momentum >= momentum and label_cost <= path_cost:
+            return False
+
+    node_labels[:] = [(label_momentum, label_cost) for label_momentum, label_cost in node_labels
+                      if label_momentum > momentum or label_cost < path_cost]
+    node_labels.append((momentum, path_cost))
+    return True
+
+
+def is_valid_move(child_value, parent_value, stamina, momentum=0):
+    curr_elevation = abs(parent_value)
+    future_elevation = abs(child_value)
 
     if (curr_elevation >= future_elevation):
         return True
-    if (curr_elevation < future_elevation and curr_elevation + stamina + parent.momentum >= future_elevation):
+    if (curr_elevation < future_elevation and curr_elevation + stamina + momentum >= future_elevation):
         return True
 
     return False
 
 
-def calc_elevation_cost(child: Node, parent: Node):
-    curr_elevation = abs(parent.value)
-    future_elevation = abs(child.value)
+def is_passable(child_value, parent_value):
+    # the cliff rule: no moving onto a tree taller than where we stand
+    return not (child_value < 0 and abs(child_value) > abs(parent_value))
+
+
+def calc_elevation_cost(child_value, parent_value, momentum=0):
+    curr_elevation = abs(parent_value)
+    future_elevation = abs(child_value)
 
     if curr_elevation >= future_elevation:
         return 0
     else:
-        return future_elevation - curr_elevation - parent.momentum
+        return max(0, future_elevation - curr_elevation - momentum)
 
 
-def write_output(solution: OrderedDict):
+def format_paths(solution: OrderedDict):
     lines = []
     for key in solution.keys():
         if solution.get(key) != 'FAIL':
@@ -282,21 +1510,250 @@ def write_output(solution: OrderedDict):
         else:
             line = solution.get(key) + "\n"
             lines.append(line)
+    return lines
+
+
+def write_output(solution: OrderedDict):
+    write_lines(format_paths(solution))
+
 
+def write_lines(lines):
     with open("output.txt", "w") as f:
         f.writelines(lines)
 
 
+def terrain_digest(dim, rows):
+    # sha1 of the dimensions and the cells as int32, whatever typecode the
+    # rows are stored in. rows may split the cells into any row-major runs.
+    digest = hashlib.sha1(array('i', dim).tobytes())
+    for row in rows:
+        digest.update(row.tobytes() if row.typecode == 'i' else array('i', row).tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    # output.txt contents on disk, one file per query, named by a hash of
+    # the terrain, the query and the options that can change the answer.
+    # a hit touches the file, so the oldest modification time is the least
+    # recently used entry and goes first once the directory outgrows
+    # max_bytes.
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, algo, fields, options):
+        width = fields["dim"][0]
+        if fields.get("elevations") is not None:
+            elevations = fields["elevations"]
+            rows = (elevations[k:k + width] for k in range(0, len(elevations), width))
+        else:
+            rows = fields["terrain_map"]
+        query = [terrain_digest(fields["dim"], rows), algo, fields["start"],
+                 fields["stamina"], fields["lodges"], options]
+        return hashlib.sha1(json.dumps(query).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.out")
+
+    def get(self, key):
+        try:
+            with open(self.path(key), "r") as f:
+                lines = f.readlines()
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            return None
+        return lines
+
+    def put(self, key, lines):
+        # written under a temporary name so readers never see half a file
+        temp = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(temp, "w") as f:
+            f.writelines(lines)
+        os.replace(temp, self.path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".out"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+func_map = {
+    "BFS": bfs,
+    "UCS": ucs,
+    "A*": a_star,
+    "Dial": dial,
+    "Dial-A*": dial_a_star
+}
+
+
+def answer_query(mountain: Mountain, line, hierarchy=None):
+    # one JSON query per line, e.g.
+    # {"id": 1, "algo": "A*", "start": [1, 0], "stamina": 3, "lodges": [[4, 3]]}
+    # answered with {"id": 1, "paths": ["1,0 1,1 ...", "FAIL"]}.
+    # hierarchy is (cluster_size, exact) to route on the cluster abstraction;
+    # it is built once per algorithm and stamina and kept on the mountain,
+    # so later queries with them only pay for the route
+    query = {}
+    try:
+        query = json.loads(line)
+        search = func_map[query["algo"]]
+        view = mountain.with_query(
+            start=tuple(query["start"]),
+            stamina=int(query["stamina"]),
+            lodges=[tuple(lodge) for lodge in query["lodges"]])
+        if hierarchy is not None:
+            paths = hierarchical(view, query["algo"], *hierarchy)
+        else:
+            if query["algo"] == "A*":
+                view.calculate_heuristics()
+            paths = search(view)
+        response = {"paths": [path.rstrip() for path in format_paths(paths)]}
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        response = {"error": repr(e)}
+
+    if isinstance(query, dict) and "id" in query:
+        response["id"] = query["id"]
+    return json.dumps(response)
+
+
+def serve_stdin(mountain: Mountain, workers, hierarchy=None):
+    # queries are answered concurrently, so responses may come back out of
+    # order; clients match them up with the "id" field
+    lock = Lock()
+
+    def respond(future):
+        with lock:
+            sys.stdout.write(future.result() + "\n")
+            sys.stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for line in sys.stdin:
+            if line.strip():
+                executor.submit(answer_query, mountain, line,
+                                hierarchy).add_done_callback(respond)
+
+
+def serve_socket(mountain: Mountain, path, hierarchy=None):
+    # every connection gets its own thread, queries on one connection are
+    # answered in order
+    class QueryHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if line.strip():
+                    self.wfile.write(
+                        (answer_query(mountain, line, hierarchy) + "\n").encode())
+
+    with socketserver.ThreadingUnixStreamServer(path, QueryHandler) as server:
+        server.serve_forever()
+
+
 if __name__ == "__main__":
-    algo, mountain = read_input()
-    func_map = {
-        "BFS": bfs,
-        "UCS": ucs,
-        "A*": a_star
-    }
-
-    if algo == "A*":
-        mountain.calculate_heuristics()
-
-    paths = func_map.get(algo)(mountain)
-    write_output(paths)
+    parser = ArgumentParser()
+    parser.add_argument("--compact", action="store_true",
+                        help="store the terrain in a flat elevation buffer instead of Node objects")
+    parser.add_argument("--serve", action="store_true",
+                        help="load the terrain from input.txt once and answer JSON queries from stdin")
+    parser.add_argument("--socket", metavar="PATH",
+                        help="answer JSON queries on a Unix socket instead of stdin")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="threads answering stdin queries")
+    parser.add_argument("--landmarks", type=int, default=0, metavar="K",
+                        help="strengthen the A* heuristic with K precomputed landmarks")
+    parser.add_argument("--landmark-dir", default=".",
+                        help="where landmark distance tables are cached")
+    parser.add_argument("--hierarchical", action="store_true",
+                        help="route on an HPA*-style cluster abstraction of the terrain, also for --serve/--socket queries")
+    parser.add_argument("--cluster-size", type=int, default=16,
+                        help="cluster width and height for --hierarchical")
+    parser.add_argument("--sparse", action="store_true",
+                        help="keep one crossing per entrance (HPA*); builds faster, routes may cost more")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="spread A* lodges over this many worker processes")
+    parser.add_argument("--updates", metavar="FILE",
+                        help="repair the BFS/UCS answer after each batch of elevation changes in FILE")
+    parser.add_argument("--compare", action="store_true",
+                        help="with --updates, also run a full search per batch and print its expansions")
+    parser.add_argument("--cache-dir", metavar="DIR",
+                        help="reuse answers of repeated one-shot queries cached in DIR")
+    parser.add_argument("--cache-size", type=int, default=64 << 20, metavar="BYTES",
+                        help="evict the least recently used answers once --cache-dir holds more")
+    parser.add_argument("--stats", action="store_true",
+                        help="write search counters and phase timings to stats.json")
+    args = parser.parse_args()
+
+    # phase timings and search counters, only collected with --stats
+    stats = {} if args.stats else None
+    started = perf_counter()
+    algo, fields = parse_input(compact=args.compact)
+    started = record_phase(stats, "parse", started)
+    cache = key = lines = None
+    if args.cache_dir and not (args.socket or args.serve or args.updates):
+        # looked up before the mountain is built, a hit only costs the parse
+        options = {"hierarchical": args.hierarchical, "landmarks": args.landmarks}
+        if args.hierarchical:
+            options.update(cluster_size=args.cluster_size, exact=not args.sparse)
+        cache = ResultCache(args.cache_dir, args.cache_size)
+        key = cache.key(algo, fields, options)
+        lines = cache.get(key)
+        started = record_phase(stats, "cache", started)
+
+    if lines is not None:
+        write_lines(lines)
+        write_stats(stats)
+        sys.exit()
+
+    mountain = (GridMountain if args.compact else Mountain)(**fields)
+    started = record_phase(stats, "build", started)
+    if args.landmarks:
+        mountain.load_landmarks(args.landmarks, args.landmark_dir)
+        started = record_phase(stats, "landmarks", started)
+
+    hierarchy = (args.cluster_size, not args.sparse) if args.hierarchical else None
+    if args.socket:
+        serve_socket(mountain, args.socket, hierarchy)
+    elif args.serve:
+        serve_stdin(mountain, args.workers, hierarchy)
+    elif args.updates:
+        if algo not in ("BFS", "UCS"):
+            parser.error("--updates only supports BFS and UCS inputs")
+        try:
+            paths = replan(mountain, algo, args.updates, args.compare)
+        except ValueError as e:
+            parser.error(str(e))
+        write_output(paths)
+    else:
+        if algo == "A*" and args.processes > 1:
+            paths = parallel_a_star(mountain, args.processes,
+                                    args.landmarks, args.landmark_dir)
+        elif args.hierarchical:
+            paths = hierarchical(mountain, algo, args.cluster_size, not args.sparse)
+        else:
+            if algo == "A*":
+                mountain.calculate_heuristics()
+                started = record_phase(stats, "heuristics", started)
+            paths = func_map.get(algo)(mountain, stats=stats)
+        started = record_phase(stats, "search", started)
+
+        lines = format_paths(paths)
+        write_lines(lines)
+        if cache is not None:
+            cache.put(key, lines)
+        record_phase(stats, "write", started)
+        write_stats(stats)
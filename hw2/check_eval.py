@@ -0,0 +1,150 @@
+from argparse import ArgumentParser
+from random import Random
+import sys
+
+from homework import LinePatterns, Pente, Player
+
+
+def player_for(rows, color, w_cap, b_cap):
+    # the Player read_input would make, without going through input.txt
+    player = Player()
+    player.board = Pente(board=rows, color=color, seconds_left=100.0,
+                         w_cap=w_cap, b_cap=b_cap, move_num=0)
+    player.ci, player.oci = player.board.ci, player.board.oci
+    player.board.move_num = player.calc_move_num()
+    player.ci_cap = w_cap if player.ci == Pente.WHITE else b_cap
+    player.oci_cap = b_cap if player.oci == Pente.BLACK else w_cap
+    return player
+
+
+def board_rows(board: Pente):
+    states = {state: ci for ci, state in LinePatterns.STATES.items()}
+    return [[states.get(board.patterns.grid[x * Pente.STRIDE + y], '.')
+             for y in range(Pente.BOARD_SIZE)] for x in range(Pente.BOARD_SIZE)]
+
+
+def line_count(rows, own, opp):
+    # heuristic1/3 cell by cell: most own stones an empty cell sees along one
+    # line, up to four cells each way, a side stops at an opponent stone and
+    # counts nothing if it runs off the board
+    size = Pente.BOARD_SIZE
+    best = 0
+    for x in range(size):
+        for y in range(size):
+            if rows[x][y] != '.':
+                continue
+            for dx, dy in LinePatterns.STEPS:
+                seen = 0
+                for sx, sy in ((dx, dy), (-dx, -dy)):
+                    if not (0 <= x + 4 * sx < size and 0 <= y + 4 * sy < size):
+                        continue
+                    for k in range(1, 5):
+                        stone = rows[x + k * sx][y + k * sy]
+                        if stone == opp:
+                            break
+                        seen += stone == own
+                best = max(best, seen)
+    return best
+
+
+def capture_setups(rows, own, opp):
+    # heuristic2/4 cell by cell: two for every empty cell next to a pair of
+    # own stones with an opponent stone behind them
+    size = Pente.BOARD_SIZE
+    count = 0
+    for x in range(size):
+        for y in range(size):
+            if rows[x][y] != '.':
+                continue
+            for dx, dy in LinePatterns.STEPS:
+                for sx, sy in ((dx, dy), (-dx, -dy)):
+                    if 0 <= x + 3 * sx < size and 0 <= y + 3 * sy < size and \
+                            rows[x + sx][y + sy] == rows[x + 2 * sx][y + 2 * sy] == own and \
+                            rows[x + 3 * sx][y + 3 * sy] == opp:
+                        count += 2
+    return count
+
+
+def check(player: Player):
+    # problems with the incremental state of player's board, compared with
+    # a board built from scratch and with the heuristics computed cell by cell
+    board = player.board
+    rows = board_rows(board)
+    fresh = player_for(rows, "WHITE" if board.ci == Pente.WHITE else "BLACK",
+                       board.w_cap, board.b_cap)
+    fresh.ci, fresh.oci = player.ci, player.oci
+    fresh.ci_cap, fresh.oci_cap = player.ci_cap, player.oci_cap
+
+    problems = []
+    if board.hash != fresh.board.hash:
+        problems.append("hash")
+    if (board.near, board.candidates) != (fresh.board.near, fresh.board.candidates):
+        problems.append("candidates")
+    patterns, rebuilt = board.patterns, fresh.board.patterns
+    if (patterns.grid, patterns.codes, patterns.counts, patterns.setups) != \
+            (rebuilt.grid, rebuilt.codes, rebuilt.counts, rebuilt.setups):
+        problems.append("patterns")
+
+    heuristics = (line_count(rows, player.ci, player.oci),
+                  capture_setups(rows, player.ci, player.oci),
+                  line_count(rows, player.oci, player.ci),
+                  capture_setups(rows, player.oci, player.ci))
+    if (player.heuristic1(), player.heuristic2(), player.heuristic3(),
+            player.heuristic4()) != heuristics:
+        problems.append("heuristics")
+    expected = (float(heuristics[0]) + float(player.ci_cap)) - \
+        (1.2 * float(heuristics[1])) - (1.2 * float(heuristics[2]))
+    if player.eval() != expected or fresh.eval() != expected:
+        problems.append("eval")
+    if board.check_game_end() != board.check_board_end():
+        problems.append("game end")
+    return problems
+
+
+def main():
+    parser = ArgumentParser(description="check the incremental Pente evaluation over seeded playouts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--boards", type=int, default=100)
+    parser.add_argument("--moves", type=int, default=30,
+                        help="longest random playout from each board")
+    args = parser.parse_args()
+
+    rng = Random(args.seed)
+    positions = failures = 0
+    for number in range(args.boards):
+        density = rng.choice([0.0, 0.02, 0.1, 0.3, 0.6])
+        rows = [[rng.choices('.wb', [1 - density, density / 2, density / 2])[0]
+                 for _ in range(Pente.BOARD_SIZE)] for _ in range(Pente.BOARD_SIZE)]
+        player = player_for(rows, rng.choice(["WHITE", "BLACK"]),
+                            rng.choice([0, 2, 4, 8]), rng.choice([0, 2, 6, 8]))
+        board = player.board
+        if board.check_game_end():
+            continue
+
+        # forward through a random game and back again, checking every position
+        played = 0
+        for step in range(-1, rng.randint(1, args.moves)):
+            if step >= 0:
+                moves = list(board.get_valid_moves())
+                if not moves or board.check_game_end():
+                    break
+                board.make_move(rng.choice(moves))
+                played += 1
+            positions += 1
+            for problem in check(player):
+                failures += 1
+                print(f"board {number} after {played} moves: {problem}")
+        while played:
+            board.unmake_move()
+            played -= 1
+            positions += 1
+            for problem in check(player):
+                failures += 1
+                print(f"board {number} unmade to {played} moves: {problem}")
+
+    print(f"{positions} positions, {failures} problems")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
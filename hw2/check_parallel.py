@@ -0,0 +1,47 @@
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from random import Random
+import sys
+
+from check_eval import player_for
+from homework import Pente, attach_game
+
+
+def main():
+    # the parallel root search under every process start method against the
+    # serial search. spawn and forkserver workers share nothing with this
+    # process and have to set up their own game
+    parser = ArgumentParser(description="check the parallel Pente root search under each start method")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--boards", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--processes", type=int, default=2)
+    args = parser.parse_args()
+
+    rng = Random(args.seed)
+    failures = 0
+    for number in range(args.boards):
+        rows = [[rng.choices('.wb', [0.9, 0.05, 0.05])[0] for _ in range(Pente.BOARD_SIZE)]
+                for _ in range(Pente.BOARD_SIZE)]
+        player = player_for(rows, rng.choice(["WHITE", "BLACK"]), 0, 0)
+        if player.board.check_game_end():
+            continue
+        player.table.new_search()
+        serial = player.alpha_beta_max(float("-inf"), float("inf"), args.depth)
+
+        for method in multiprocessing.get_all_start_methods():
+            with ProcessPoolExecutor(
+                    max_workers=args.processes, mp_context=multiprocessing.get_context(method),
+                    initializer=attach_game,
+                    initargs=(player.board, player.ci_cap, player.oci_cap)) as executor:
+                parallel = player.parallel_root(args.depth, executor, args.processes)
+            if parallel != serial:
+                failures += 1
+            print(f"board {number} {method}: serial {serial}, parallel {parallel}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,162 @@
-import copy
-from time import process_time
+from argparse import ArgumentParser
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import inspect
+from itertools import compress, product
+import os
+from random import Random
+from time import perf_counter, process_time
+
+
+def zobrist_keys(seed, count):
+    # fixed seeds, so every process hashes a position to the same key
+    keys = Random(seed)
+    return [keys.getrandbits(64) for _ in range(count)]
+
+
+def neighbourhoods(size, stride, reach):
+    # bit indexes of the cells within reach (in both x and y) of every cell
+    cells = [[] for _ in range(size * stride)]
+    for x in range(size):
+        for y in range(size):
+            for dx in range(-reach, reach + 1):
+                for dy in range(-reach, reach + 1):
+                    if (dx or dy) and 0 <= x + dx < size and 0 <= y + dy < size:
+                        cells[x * stride + y].append((x + dx) * stride + y + dy)
+    return cells
+
+
+def windows_through(size, stride, steps, reach):
+    # (window, shift, p) for every window of a cell p that holds the cell,
+    # shift is where the cell sits in the window's code
+    through = [[] for _ in range(size * stride)]
+    for x in range(size):
+        for y in range(size):
+            for line, (dx, dy) in enumerate(steps):
+                for k in range(-reach, reach + 1):
+                    px, py = x - k * dx, y - k * dy
+                    if 0 <= px < size and 0 <= py < size:
+                        p = px * stride + py
+                        through[x * stride + y].append(
+                            (p * len(steps) + line, 2 * (k + reach), p))
+    return through
+
+
+def threat_weights(own, opp, own_weights, opp_weights):
+    # move ordering score of every threats byte of LinePatterns for the side
+    # whose flags sit at shift own. weights are for a (five, four, three,
+    # capture), a move scores every one it makes or blocks
+    flags = (LinePatterns.FIVE, LinePatterns.FOUR, LinePatterns.THREE, LinePatterns.CAPTURE)
+    scores = []
+    for threats in range(256):
+        score = 0
+        for flag, own_weight, opp_weight in zip(flags, own_weights, opp_weights):
+            if threats & (flag << own):
+                score += own_weight
+            if threats & (flag << opp):
+                score += opp_weight
+        scores.append(score)
+    return scores
 
 
 class Pente:
     BOARD_SIZE = 19
     WHITE = 'w'
     BLACK = 'b'
+    # the board is one int per colour with cell (x, y) at bit x * STRIDE + y.
+    # the spare column y == 19 is never set, so a line that steps off the
+    # side of the board lands on an empty guard bit instead of wrapping
+    # onto the next row.
+    STRIDE = BOARD_SIZE + 1
+    # steps along a row, a column and both diagonals
+    LINES = (1, STRIDE, STRIDE + 1, STRIDE - 1)
+    DIRECTIONS = LINES + tuple(-step for step in LINES)
+    # every cell of the board, bit strings are written highest bit first
+    FULL = int(('0' + '1' * BOARD_SIZE) * BOARD_SIZE, 2)
+    # (x, y) of every bit, guard bits included
+    CELLS = list(product(range(BOARD_SIZE), range(STRIDE)))
+    BIT_FLAGS = bytes.maketrans(b"01", b"\0\1")
+    # zobrist keys per stone, per capture count (a move captures at most
+    # 16 stones, so counts stay well below 64) and for black to move
+    STONE_KEYS = {WHITE: zobrist_keys(1, BOARD_SIZE * STRIDE),
+                  BLACK: zobrist_keys(2, BOARD_SIZE * STRIDE)}
+    CAPTURE_KEYS = {WHITE: zobrist_keys(3, 64), BLACK: zobrist_keys(4, 64)}
+    BLACK_TO_MOVE = zobrist_keys(5, 1)[0]
+    # moves are only generated within CANDIDATE_REACH of a stone
+    CANDIDATE_REACH = 2
+    NEAR = neighbourhoods(BOARD_SIZE, STRIDE, CANDIDATE_REACH)
 
     def __init__(self, board, color, seconds_left, w_cap, b_cap, move_num):
-        self.board = board
+        self.stones = {Pente.WHITE: 0, Pente.BLACK: 0}
+        for x, row in enumerate(board):
+            for y, intersection in enumerate(row):
+                if intersection in self.stones:
+                    self.stones[intersection] |= 1 << (x * Pente.STRIDE + y)
         self.color = color
         self.seconds_left = seconds_left
         self.w_cap = w_cap
         self.b_cap = b_cap
         self.move_num = move_num
-        self.board_history = []
         self.move_history = []
         self.capture_history = []
+        # ends[i] caches check_game_end after move_history[i], None until asked
+        self.ends = []
         self.ci = Pente.WHITE if self.color == "WHITE" else Pente.BLACK
         self.oci = Pente.BLACK if self.color == "WHITE" else Pente.WHITE
         self.winner: str
+        self.hash = self.zobrist_hash()
+        # near[cell] counts the stones around cell, candidates has the
+        # cells where it is not zero
+        self.near = [0] * (Pente.BOARD_SIZE * Pente.STRIDE)
+        self.candidates = 0
+        for stones in self.stones.values():
+            for cell in Pente.bits(stones):
+                self.touch(cell, 1)
+        self.patterns = LinePatterns(self.stones)
+
+    def zobrist_hash(self):
+        # from scratch, make_move and unmake_move keep it up to date
+        key = Pente.CAPTURE_KEYS[Pente.WHITE][self.w_cap] ^ \
+            Pente.CAPTURE_KEYS[Pente.BLACK][self.b_cap]
+        if self.ci == Pente.BLACK:
+            key ^= Pente.BLACK_TO_MOVE
+        for ci, stones in self.stones.items():
+            for cell in Pente.bits(stones):
+                key ^= Pente.STONE_KEYS[ci][cell]
+        return key
+
+    @staticmethod
+    def bits(bits):
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            yield bit.bit_length() - 1
+
+    @staticmethod
+    def count(bits):
+        return bin(bits).count("1")
+
+    def empty(self):
+        return Pente.FULL & ~(self.stones[Pente.WHITE] | self.stones[Pente.BLACK])
 
     def check_game_end(self):
+        # a position searched into was not over before its last move, so only
+        # that stone can have made a five and only its colour can have
+        # captured enough. the first position gets a full scan
+        if not self.move_history:
+            return self.check_board_end()
+        end = self.ends[-1]
+        if end is None:
+            x, y = self.move_history[-1]
+            end = self.check_five_at(x * Pente.STRIDE + y, self.oci) or \
+                self.check_capture_win_for(self.oci)
+            self.ends[-1] = end
+        if end:
+            self.winner = self.oci
+        return end
+
+    def check_board_end(self):
         if self.check_row_win_for(Pente.WHITE):
             self.winner = Pente.WHITE
             return True
@@ -37,44 +172,31 @@ class Pente:
         return False
 
     def check_row_win_for(self, ci):
-        # horizontal
-        for y in range(Pente.BOARD_SIZE):
-            for x in range(Pente.BOARD_SIZE - 4):
-                if self.board[x][y] == ci \
-                        and self.board[x+1][y] == ci \
-                        and self.board[x+2][y] == ci \
-                        and self.board[x+3][y] == ci \
-                        and self.board[x+4][y] == ci:
-                    return True
-        # vertical
-        for x in range(Pente.BOARD_SIZE):
-            for y in range(Pente.BOARD_SIZE - 4):
-                if self.board[x][y] == ci \
-                        and self.board[x][y+1] == ci \
-                        and self.board[x][y+2] == ci \
-                        and self.board[x][y+3] == ci \
-                        and self.board[x][y+4] == ci:
-                    return True
-
-        # diagonal
-        for x in range(Pente.BOARD_SIZE - 4):
-            for y in range(4, Pente.BOARD_SIZE):
-                if self.board[x][y] == ci \
-                        and self.board[x+1][y-1] == ci \
-                        and self.board[x+2][y-2] == ci \
-                        and self.board[x+3][y-3] == ci \
-                        and self.board[x+4][y-4] == ci:
-                    return True
-
-        # other diagonal
-        for x in range(Pente.BOARD_SIZE - 4):
-            for y in range(Pente.BOARD_SIZE - 4):
-                if self.board[x][y] == ci \
-                        and self.board[x+1][y+1] == ci \
-                        and self.board[x+2][y+2] == ci \
-                        and self.board[x+3][y+3] == ci \
-                        and self.board[x+4][y+4] == ci:
-                    return True
+        # a bit survives when the four cells after it along the line are
+        # the same colour
+        stones = self.stones[ci]
+        for step in Pente.LINES:
+            run = stones
+            for k in range(1, 5):
+                run &= stones >> (k * step)
+            if run:
+                return True
+        return False
+
+    def check_five_at(self, cell, ci):
+        # a run of 5 or more ci stones through cell. guard cells stay empty,
+        # so a run stops at the side of the board
+        grid = self.patterns.grid
+        state = LinePatterns.STATES[ci]
+        for step in Pente.LINES:
+            run = 1
+            for direction in (step, -step):
+                other = cell + direction
+                while 0 <= other < len(grid) and grid[other] == state and run < 5:
+                    run += 1
+                    other += direction
+            if run >= 5:
+                return True
         return False
 
     def check_capture_win_for(self, color):
@@ -83,6 +205,16 @@ class Pente:
         else:
             return self.b_cap >= 10
 
+    def touch(self, cell, change):
+        # a stone was put on (change 1) or taken off (change -1) cell
+        near = self.near
+        flip = 1 if change > 0 else 0
+        for other in Pente.NEAR[cell]:
+            near[other] += change
+            # the count went from 0 to 1 or from 1 to 0
+            if near[other] == flip:
+                self.candidates ^= 1 << other
+
     def get_valid_moves(self):
         if self.ci == Pente.WHITE:
             if self.move_num == 1:
@@ -99,141 +231,438 @@ class Pente:
                     intersections)
                 return intersections
 
-        return self.get_empty_intersections()
+        if not self.candidates:
+            return self.get_empty_intersections()
+        return self.get_candidate_moves()
 
     def make_move(self, move):
-        self.board_history.append(copy.deepcopy(self.board))
-        self.capture_history.append((self.w_cap, self.b_cap))
+        # only the move and the stones it captured are recorded, that is
+        # all unmake_move needs to put the board back
+        cell = move[0] * Pente.STRIDE + move[1]
         self.move_history.append(move)
-
-        self.board[move[0]][move[1]] = self.ci
-        self.check_for_capture(move)
+        self.stones[self.ci] |= 1 << cell
+        self.hash ^= Pente.STONE_KEYS[self.ci][cell]
+        self.touch(cell, 1)
+        self.patterns.put(cell, LinePatterns.STATES[self.ci])
+        captured = self.check_for_capture(move)
+        for stone in Pente.bits(captured):
+            self.touch(stone, -1)
+            self.patterns.put(stone, 0)
+        self.capture_history.append(captured)
+        self.ends.append(None)
 
         self.move_num += 1
         self.ci, self.oci = self.oci, self.ci
+        self.hash ^= Pente.BLACK_TO_MOVE
 
     def unmake_move(self):
-        if self.move_history.pop():
-            self.board = self.board_history.pop()
-            self.move_num -= 1
-            capture_history = self.capture_history.pop()
-            self.w_cap = capture_history[0]
-            self.b_cap = capture_history[1]
-            self.ci, self.oci = self.oci, self.ci
-
-    def check_for_capture(self, move):
-        x, y = move
-        # horizontal
-        if y > 2 and \
-                self.board[x][y-1] == self.oci \
-                and self.board[x][y-2] == self.oci \
-                and self.board[x][y-3] == self.ci:
-            self.board[x][y-1] = '.'
-            self.board[x][y-2] = '.'
-            if self.ci == Pente.WHITE:
-                self.w_cap += 2
-            else:
-                self.b_cap += 2
-
-        if y < Pente.BOARD_SIZE - 3 and \
-                self.board[x][y+1] == self.oci \
-                and self.board[x][y+2] == self.oci \
-                and self.board[x][y+3] == self.ci:
-            self.board[x][y+1] = '.'
-            self.board[x][y+2] = '.'
-
-            if self.ci == Pente.WHITE:
-                self.w_cap += 2
-            else:
-                self.b_cap += 2
-
-        # vertical
-        if x > 2 and \
-                self.board[x-1][y] == self.oci \
-                and self.board[x-2][y] == self.oci \
-                and self.board[x-3][y] == self.ci:
-            self.board[x-1][y] = '.'
-            self.board[x-2][y] = '.'
-
-            if self.ci == Pente.WHITE:
-                self.w_cap += 2
-            else:
-                self.b_cap += 2
-
-        if x < Pente.BOARD_SIZE - 3 and \
-                self.board[x+1][y] == self.oci \
-                and self.board[x+2][y] == self.oci \
-                and self.board[x+3][y] == self.ci:
-            self.board[x+1][y] = '.'
-            self.board[x+2][y] = '.'
-
-            if self.ci == Pente.WHITE:
-                self.w_cap += 2
-            else:
-                self.b_cap += 2
-
-        # check diagonal captures
-        if (x > 2 and y > 2 and
-                self.board[x-1][y-1] == self.oci and
-                self.board[x-2][y-2] == self.oci and
-                self.board[x-3][y-3] == self.ci):
-            self.board[x-1][y-1] = '.'
-            self.board[x-2][y-2] = '.'
-
-            if self.ci == Pente.WHITE:
-                self.w_cap += 2
-            else:
-                self.b_cap += 2
-
-        if (x < Pente.BOARD_SIZE - 3 and y < Pente.BOARD_SIZE - 3 and
-                self.board[x+1][y+1] == self.oci and
-                self.board[x+2][y+2] == self.oci and
-                self.board[x+3][y+3] == self.ci):
-            self.board[x+1][y+1] = '.'
-            self.board[x+2][y+2] = '.'
-
-            if self.ci == Pente.WHITE:
-                self.w_cap += 2
-            else:
-                self.b_cap += 2
-
-        # check other diagonal captures
-        if (x > 2 and y < Pente.BOARD_SIZE - 3 and
-                self.board[x-1][y+1] == self.oci and
-                self.board[x-2][y+2] == self.oci and
-                self.board[x-3][y+3] == self.ci):
-            self.board[x-1][y+1] = '.'
-            self.board[x-2][y+2] = '.'
-
+        move = self.move_history.pop()
+        captured = self.capture_history.pop()
+        self.ends.pop()
+        self.ci, self.oci = self.oci, self.ci
+        self.hash ^= Pente.BLACK_TO_MOVE
+        self.move_num -= 1
+
+        cell = move[0] * Pente.STRIDE + move[1]
+        self.stones[self.ci] ^= 1 << cell
+        self.hash ^= Pente.STONE_KEYS[self.ci][cell]
+        self.touch(cell, -1)
+        self.patterns.put(cell, 0)
+        if captured:
+            self.stones[self.oci] |= captured
+            for cell in Pente.bits(captured):
+                self.hash ^= Pente.STONE_KEYS[self.oci][cell]
+                self.touch(cell, 1)
+                self.patterns.put(cell, LinePatterns.STATES[self.oci])
             if self.ci == Pente.WHITE:
-                self.w_cap += 2
+                self.hash ^= Pente.CAPTURE_KEYS[Pente.WHITE][self.w_cap]
+                self.w_cap -= Pente.count(captured)
+                self.hash ^= Pente.CAPTURE_KEYS[Pente.WHITE][self.w_cap]
             else:
-                self.b_cap += 2
-
-        if (x < Pente.BOARD_SIZE - 3 and y < Pente.BOARD_SIZE - 3 and
-                self.board[x+1][y-1] == self.oci and
-                self.board[x+2][y-2] == self.oci and
-                self.board[x+3][y-3] == self.ci):
-            self.board[x+1][y-1] = '.'
-            self.board[x+2][y-2] = '.'
+                self.hash ^= Pente.CAPTURE_KEYS[Pente.BLACK][self.b_cap]
+                self.b_cap -= Pente.count(captured)
+                self.hash ^= Pente.CAPTURE_KEYS[Pente.BLACK][self.b_cap]
 
-            if self.ci == Pente.WHITE:
-                self.w_cap += 2
-            else:
-                self.b_cap += 2
-            return True
+    def check_for_capture(self, move):
+        # a pair of opponent stones flanked by the new stone and another of
+        # ours is removed, along all eight directions. returns the removed
+        # stones as a bitboard
+        cell = move[0] * Pente.STRIDE + move[1]
+        own = self.stones[self.ci]
+        opp = self.stones[self.oci]
+        captured = 0
+        for step in Pente.DIRECTIONS:
+            end = cell + 3 * step
+            if end < 0 or not (own >> end) & 1:
+                continue
+            pair = (1 << (cell + step)) | (1 << (cell + 2 * step))
+            if opp & pair == pair:
+                captured |= pair
+                self.hash ^= Pente.STONE_KEYS[self.oci][cell + step] ^ \
+                    Pente.STONE_KEYS[self.oci][cell + 2 * step]
+                if self.ci == Pente.WHITE:
+                    self.hash ^= Pente.CAPTURE_KEYS[Pente.WHITE][self.w_cap]
+                    self.w_cap += 2
+                    self.hash ^= Pente.CAPTURE_KEYS[Pente.WHITE][self.w_cap]
+                else:
+                    self.hash ^= Pente.CAPTURE_KEYS[Pente.BLACK][self.b_cap]
+                    self.b_cap += 2
+                    self.hash ^= Pente.CAPTURE_KEYS[Pente.BLACK][self.b_cap]
+        self.stones[self.oci] = opp & ~captured
+        return captured
 
     def get_empty_intersections(self):
-        empty_intersection = []
-        for x in range(Pente.BOARD_SIZE):
-            for y in range(Pente.BOARD_SIZE):
-                if self.board[x][y] == ".":
-                    empty_intersection.append((x, y))
-        return empty_intersection
+        return self.moves_in(self.empty())
+
+    def get_candidate_moves(self):
+        return self.moves_in(self.candidates & self.empty())
+
+    @staticmethod
+    def moves_in(bits):
+        # reversed, bin() spells out one character per bit from bit 0 up
+        flags = bin(bits)[:1:-1].encode().translate(Pente.BIT_FLAGS)
+        return list(compress(Pente.CELLS, flags))
+
+
+class LinePatterns:
+    # what evaluation and move ordering need to know about the lines through
+    # every cell, kept up to date one stone at a time.
+    # each cell p has a window per line: the cells p - 4 step, ..., p + 4 step
+    # packed 2 bits each from the lowest up, 0 empty, 1 white, 2 black and 3
+    # off the board. VALUES[code] is (white seen, black seen, white pairs,
+    # black pairs, threats) for the centre: the stones of each colour it sees
+    # along the line (a side stops at the other colour and is worth nothing
+    # if it runs off the board), how many pairs of that colour it is the
+    # empty end of with the other colour behind them, and flags for what a
+    # stone of each colour played there would do, white's in the low bits
+    REACH = 4
+    WINDOW = 2 * REACH + 1
+    STATES = {Pente.WHITE: 1, Pente.BLACK: 2}
+    OFF_BOARD = 3
+    MOST = 2 * REACH
+    # a stone on the centre makes a run of 5, 4 or 3, or captures a pair
+    FIVE = 1
+    FOUR = 2
+    THREE = 4
+    CAPTURE = 8
+    THREAT_SHIFT = {Pente.WHITE: 0, Pente.BLACK: 4}
+    # Pente.LINES as (dx, dy)
+    STEPS = ((0, 1), (1, 0), (1, 1), (1, -1))
+    THROUGH = windows_through(Pente.BOARD_SIZE, Pente.STRIDE, STEPS, REACH)
+    # read by the first LinePatterns, see load_or_build
+    VALUES = None
+
+    def __init__(self, stones):
+        if LinePatterns.VALUES is None:
+            LinePatterns.VALUES = LinePatterns.load_or_build(
+                os.path.dirname(os.path.abspath(__file__)))
+        size, stride, reach = Pente.BOARD_SIZE, Pente.STRIDE, LinePatterns.REACH
+        self.grid = [0] * (size * stride)
+        for ci, state in LinePatterns.STATES.items():
+            for cell in Pente.bits(stones[ci]):
+                self.grid[cell] = state
+
+        lines = len(LinePatterns.STEPS)
+        values = LinePatterns.VALUES
+        self.codes = [0] * (size * stride * lines)
+        # counts[colour][k]: (empty cell, line) pairs seeing k stones
+        self.counts = {ci: [0] * (LinePatterns.MOST + 1) for ci in LinePatterns.STATES}
+        self.setups = {ci: 0 for ci in LinePatterns.STATES}
+        for x in range(size):
+            for y in range(size):
+                cell = x * stride + y
+                for line, (dx, dy) in enumerate(LinePatterns.STEPS):
+                    code = 0
+                    for k in range(-reach, reach + 1):
+                        nx, ny = x + k * dx, y + k * dy
+                        state = self.grid[nx * stride + ny] \
+                            if 0 <= nx < size and 0 <= ny < size else LinePatterns.OFF_BOARD
+                        code |= state << (2 * (k + reach))
+                    self.codes[cell * lines + line] = code
+                    self.setups[Pente.WHITE] += values[code][2]
+                    self.setups[Pente.BLACK] += values[code][3]
+                if not self.grid[cell]:
+                    self.join(cell)
+
+    def join(self, cell, change=1):
+        # an empty cell's lines are counted, change -1 takes them out again
+        lines = len(LinePatterns.STEPS)
+        counts_w, counts_b = self.counts[Pente.WHITE], self.counts[Pente.BLACK]
+        for window in range(cell * lines, cell * lines + lines):
+            value = LinePatterns.VALUES[self.codes[window]]
+            counts_w[value[0]] += change
+            counts_b[value[1]] += change
+
+    def put(self, cell, state):
+        # cell goes from its current state to state, only the windows
+        # holding cell change
+        grid = self.grid
+        old = grid[cell]
+        if not old:
+            self.join(cell, -1)
+        grid[cell] = state
+
+        change = state - old
+        codes = self.codes
+        values = LinePatterns.VALUES
+        counts_w, counts_b = self.counts[Pente.WHITE], self.counts[Pente.BLACK]
+        pairs_w = pairs_b = 0
+        for window, shift, p in LinePatterns.THROUGH[cell]:
+            before = values[codes[window]]
+            codes[window] += change << shift
+            after = values[codes[window]]
+            if before is after:
+                continue
+            pairs_w += after[2] - before[2]
+            pairs_b += after[3] - before[3]
+            if not grid[p]:
+                counts_w[before[0]] -= 1
+                counts_w[after[0]] += 1
+                counts_b[before[1]] -= 1
+                counts_b[after[1]] += 1
+        self.setups[Pente.WHITE] += pairs_w
+        self.setups[Pente.BLACK] += pairs_b
+
+        if not state:
+            self.join(cell)
+
+    def longest(self, ci):
+        # most ci stones an empty cell sees along one line
+        counts = self.counts[ci]
+        for count in range(LinePatterns.MOST, 0, -1):
+            if counts[count]:
+                return count
+        return 0
+
+    def threats(self, cell):
+        # threat flags of cell over all its lines
+        codes, values = self.codes, LinePatterns.VALUES
+        window = cell * len(LinePatterns.STEPS)
+        return values[codes[window]][4] | values[codes[window + 1]][4] | \
+            values[codes[window + 2]][4] | values[codes[window + 3]][4]
+
+    @staticmethod
+    def load_or_build(directory):
+        # the table only depends on the rules and builds in about 0.1s, the
+        # file just saves that on later runs. it holds one 32-bit int per
+        # code: white seen, black seen (4 bits each), white pairs, black
+        # pairs (2 bits each), then the threats byte. writing it is best
+        # effort, a read-only directory keeps the table in memory only
+        path = os.path.join(directory, f"line-patterns-{LinePatterns.digest()}.bin")
+        table = array('I')
+        try:
+            with open(path, "rb") as f:
+                table.frombytes(f.read())
+        except (OSError, ValueError):
+            table = array('I')
+        if len(table) != 1 << (2 * LinePatterns.WINDOW):
+            table = LinePatterns.build()
+            # written aside and renamed, so no process reads half a table
+            partial = f"{path}.{os.getpid()}"
+            try:
+                with open(partial, "wb") as f:
+                    table.tofile(f)
+                os.replace(partial, path)
+            except OSError:
+                if os.path.exists(partial):
+                    os.remove(partial)
+
+        unpacked = {}
+        for packed in set(table):
+            unpacked[packed] = (packed & 15, (packed >> 4) & 15, (packed >> 8) & 3,
+                                (packed >> 10) & 3, packed >> 12)
+        # equal entries are one object, put() skips unchanged windows by identity
+        return [unpacked[packed] for packed in table]
+
+    @staticmethod
+    def digest():
+        # names the table file after the code and constants that make and
+        # read it, so changing any of them never loads a stale table
+        generator = repr((LinePatterns.REACH, LinePatterns.OFF_BOARD, LinePatterns.STATES,
+                          LinePatterns.FIVE, LinePatterns.FOUR, LinePatterns.THREE,
+                          LinePatterns.CAPTURE, LinePatterns.THREAT_SHIFT))
+        for method in (LinePatterns.load_or_build, LinePatterns.build, LinePatterns.side):
+            generator += inspect.getsource(method)
+        return hashlib.sha1(generator.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def build():
+        # a window is its centre and two sides read outward from it, the
+        # sides are worked out once for every code and then combined
+        reach = LinePatterns.REACH
+        sides = [LinePatterns.side([(code >> (2 * k)) & 3 for k in range(reach)])
+                 for code in range(1 << (2 * reach))]
+        # the low side's cell next to the centre is its highest
+        low_sides = [LinePatterns.side([(code >> (2 * k)) & 3 for k in reversed(range(reach))])
+                     for code in range(1 << (2 * reach))]
+        shifts = (LinePatterns.THREAT_SHIFT[Pente.WHITE], LinePatterns.THREAT_SHIFT[Pente.BLACK])
+
+        table = array('I')
+        for high in sides:
+            for centre in range(4):
+                for low in low_sides:
+                    packed = (low[0][0] + high[0][0]) | (low[1][0] + high[1][0]) << 4
+                    if centre == 0:
+                        for colour in range(2):
+                            low_side, high_side = low[colour], high[colour]
+                            packed |= (low_side[2] + high_side[2]) << (8 + 2 * colour)
+                            run = low_side[1] + high_side[1]
+                            threats = LinePatterns.FIVE * (run >= 4) | \
+                                LinePatterns.FOUR * (run >= 3) | \
+                                LinePatterns.THREE * (run >= 2) | \
+                                LinePatterns.CAPTURE * (low_side[3] or high_side[3])
+                            packed |= threats << (12 + shifts[colour])
+                    table.append(packed)
+        return table
+
+    @staticmethod
+    def side(cells):
+        # (seen, run, pair, capture) per colour for the cells on one side
+        # of a centre, nearest first: stones seen up to the other colour,
+        # stones in a row next to the centre, a pair of the colour with the
+        # other behind it, a pair of the other colour with the colour behind it
+        values = []
+        for state in (1, 2):
+            other = 3 - state
+            seen = run = 0
+            if LinePatterns.OFF_BOARD not in cells:
+                for cell in cells:
+                    if cell == other:
+                        break
+                    seen += cell == state
+            while run < len(cells) and cells[run] == state:
+                run += 1
+            pair = cells[0] == cells[1] == state and cells[2] == other
+            capture = cells[0] == cells[1] == other and cells[2] == state
+            values.append((seen, run, int(pair), int(capture)))
+        return values
+
+
+# game copy of each parallel_deepening worker process
+worker_player = None
+
+
+def attach_game(board, ci_cap, oci_cap):
+    global worker_player
+    # a spawned or forkserver worker starts without the parent's table
+    if LinePatterns.VALUES is None:
+        LinePatterns.VALUES = LinePatterns.load_or_build(
+            os.path.dirname(os.path.abspath(__file__)))
+    worker_player = Player()
+    worker_player.board = board
+    worker_player.ci, worker_player.oci = board.ci, board.oci
+    worker_player.ci_cap, worker_player.oci_cap = ci_cap, oci_cap
+
+
+def search_root_moves(moves, depth, seconds):
+    # (value, move) of the best of moves searched to depth on the worker's
+    # board, None if seconds ran out first. the worker keeps its table,
+    # killers and history from one depth to the next
+    player, board = worker_player, worker_player.board
+    player.deadline = None if seconds is None else perf_counter() + seconds
+    player.table.new_search()
+    played = len(board.move_history)
+    best_value, best_move = float("-inf"), None
+    try:
+        for move in moves:
+            board.make_move(move)
+            value, _ = player.alpha_beta_min(best_value, float("inf"), depth - 1)
+            board.unmake_move()
+            if value > best_value:
+                best_value, best_move = value, move
+    except SearchTimeout:
+        while len(board.move_history) > played:
+            board.unmake_move()
+        return None
+    finally:
+        player.deadline = None
+    return best_value, best_move
+
+
+def compare_speedup(player: "Player", depth, processes):
+    # the root searched to depth with and without the worker processes. the
+    # parallel search goes first, so both start from empty killers and history
+    started = perf_counter()
+    with ProcessPoolExecutor(
+            max_workers=processes, initializer=attach_game,
+            initargs=(player.board, player.ci_cap, player.oci_cap)) as executor:
+        _, parallel_move = player.parallel_root(depth, executor, processes)
+    parallel = perf_counter() - started
+
+    started = perf_counter()
+    serial_move = player.alpha_beta_search(depth)
+    serial = perf_counter() - started
+    print(f"depth {depth}, {processes} processes")
+    print(f"serial:   {serial:.2f}s {serial_move}")
+    print(f"parallel: {parallel:.2f}s {parallel_move}")
+    print(f"speedup:  {serial / parallel:.2f}x")
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    # fixed number of slots indexed by the low bits of the zobrist key.
+    # entries are (key, depth, bound, value, move, generation); a slot keeps
+    # the deeper of two entries from the same search and always gives way
+    # to the current search over an older one.
+    def __init__(self, bits=20):
+        self.mask = (1 << bits) - 1
+        self.entries = [None] * (1 << bits)
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def probe(self, key):
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, bound, value, move):
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.entries[index] = (key, depth, bound, value, move, self.generation)
 
 
 class Player:
+    # depths up to SEARCH_DEPTH always finish, deeper ones only while the
+    # move's time budget lasts
     SEARCH_DEPTH = 1
+    MAX_DEPTH = 20
+    # the clock is split as if the game lasted this many of our moves, but
+    # never over fewer than MIN_MOVES_LEFT
+    EXPECTED_MOVES = 40
+    MIN_MOVES_LEFT = 10
+    # move ordering weights, a move scores every class it falls in; killer
+    # and history scores only break ties between equal scores
+    WIN = 1 << 20
+    BLOCK_WIN = 1 << 19
+    CAPTURE = 1 << 16
+    FOUR = 1 << 14
+    BLOCK_FOUR = 1 << 13
+    BLOCK_CAPTURE = 1 << 11
+    THREE = 1 << 9
+    BLOCK_THREE = 1 << 8
+    KILLER = 1 << 7
+    # ordering score of every LinePatterns threats byte, by colour to move
+    THREAT_WEIGHTS = {
+        Pente.WHITE: threat_weights(LinePatterns.THREAT_SHIFT[Pente.WHITE],
+                                    LinePatterns.THREAT_SHIFT[Pente.BLACK],
+                                    (WIN, FOUR, THREE, CAPTURE),
+                                    (BLOCK_WIN, BLOCK_FOUR, BLOCK_THREE, BLOCK_CAPTURE)),
+        Pente.BLACK: threat_weights(LinePatterns.THREAT_SHIFT[Pente.BLACK],
+                                    LinePatterns.THREAT_SHIFT[Pente.WHITE],
+                                    (WIN, FOUR, THREE, CAPTURE),
+                                    (BLOCK_WIN, BLOCK_FOUR, BLOCK_THREE, BLOCK_CAPTURE)),
+    }
     PENTE_COL_LOOKUP = {
         0: 'A',
         1: 'B',
@@ -260,6 +689,12 @@ class Player:
         self.board: Pente
         self.ci: str
         self.best_move: str = None
+        self.table = TranspositionTable()
+        self.deadline = None
+        self.depth_reached = 0
+        # two killer moves per ply and cutoff counts per (colour, move)
+        self.killers = {}
+        self.history = {}
 
     def read_input(self):
         with open("input.txt", "r") as f:
@@ -287,15 +722,16 @@ class Player:
             f.write(self.best_move)
 
     def calc_move_num(self):
-        move_num = 1
-        for x in range(Pente.BOARD_SIZE):
-            for y in range(Pente.BOARD_SIZE):
-                if self.board.board[x][y] == self.ci:
-                    move_num += 1
-        return move_num
-
-    def compute_move(self):
-        coord = self.alpha_beta_search(Player.SEARCH_DEPTH)
+        return Pente.count(self.board.stones[self.ci]) + 1
+
+    def compute_move(self, processes=1):
+        if processes > 1:
+            with ProcessPoolExecutor(
+                    max_workers=processes, initializer=attach_game,
+                    initargs=(self.board, self.ci_cap, self.oci_cap)) as executor:
+                coord = self.parallel_deepening(self.time_budget(), executor, processes)
+        else:
+            coord = self.iterative_deepening(self.time_budget())
         if coord:
             self.best_move = self.coord_to_pent(coord)
 
@@ -304,20 +740,161 @@ class Player:
         col = Player.PENTE_COL_LOOKUP[coord[1]]
         return row + col
 
+    def time_budget(self):
+        moves_left = max(Player.MIN_MOVES_LEFT, Player.EXPECTED_MOVES - self.board.move_num)
+        return self.board.seconds_left / moves_left
+
+    def iterative_deepening(self, budget):
+        # searches depth 1, 2, ... and keeps the move of the deepest search
+        # that finished. a search still running at the deadline is abandoned
+        # and its moves are unmade; the table entries it stored are reused
+        # by the next move's search
+        started = perf_counter()
+        played = len(self.board.move_history)
+        best_move = None
+        for depth in range(1, Player.MAX_DEPTH + 1):
+            # the next depth costs many times the last one, do not start it
+            # with less than half the budget left
+            if depth > Player.SEARCH_DEPTH and perf_counter() - started > budget / 2:
+                break
+            self.deadline = started + budget if depth > Player.SEARCH_DEPTH else None
+            self.table.new_search()
+            try:
+                value, move = self.alpha_beta_max(float("-inf"), float("inf"), depth)
+            except SearchTimeout:
+                while len(self.board.move_history) > played:
+                    self.board.unmake_move()
+                break
+            finally:
+                self.deadline = None
+
+            self.depth_reached = depth
+            if move is not None:
+                best_move = move
+            # a forced win or loss does not change with more depth
+            if value in (float("inf"), float("-inf")):
+                break
+        return best_move
+
+    def parallel_deepening(self, budget, executor, processes):
+        # iterative_deepening with every depth's root moves split over the
+        # worker processes. a depth some worker could not finish in time is
+        # dropped as a whole
+        started = perf_counter()
+        if self.board.check_game_end():
+            return None
+        best_move = None
+        for depth in range(1, Player.MAX_DEPTH + 1):
+            if depth > Player.SEARCH_DEPTH and perf_counter() - started > budget / 2:
+                break
+            seconds = started + budget - perf_counter() if depth > Player.SEARCH_DEPTH else None
+            result = self.parallel_root(depth, executor, processes, best_move, seconds)
+            if result is None:
+                break
+
+            value, move = result
+            self.depth_reached = depth
+            if move is not None:
+                best_move = move
+            if value in (float("inf"), float("-inf")):
+                break
+        return best_move
+
+    def parallel_root(self, depth, executor, processes, first=None, seconds=None):
+        # (value, move) of the root searched to depth by the worker processes,
+        # None if one of them ran out of time
+        moves = self.ordered_moves(first)
+        if not moves:
+            return float("-inf"), None
+        # dealt round robin, so every worker gets some of the likely best moves
+        futures = [executor.submit(search_root_moves, moves[k::processes], depth, seconds)
+                   for k in range(min(processes, len(moves)))]
+        results = [future.result() for future in futures]
+        if None in results:
+            return None
+        # of equal values the serial search keeps the move it tried first
+        order = {move: k for k, move in enumerate(moves)}
+        return max(results, key=lambda result: (result[0], -order.get(result[1], len(moves))))
+
     def alpha_beta_search(self, depth: int):
+        self.table.new_search()
         _, best_move = self.alpha_beta_max(float("-inf"), float("inf"), depth)
         return best_move
 
+    def probe(self, alpha, beta, depth):
+        # (value, move) when the table settles this node, else None. the
+        # table move is tried first either way
+        entry = self.table.probe(self.board.hash)
+        if entry is None:
+            return None, None
+        _, entry_depth, bound, value, move, _ = entry
+        if entry_depth >= depth and (
+                bound == TranspositionTable.EXACT or
+                (bound == TranspositionTable.LOWER and value >= beta) or
+                (bound == TranspositionTable.UPPER and value <= alpha)):
+            return (value, move), move
+        return None, move
+
+    def ordered_moves(self, first):
+        # table move first, then wins, blocks, captures and threats, then
+        # killers, then moves that caused the most cutoffs before
+        board = self.board
+        moves = list(board.get_valid_moves())
+        if len(moves) < 2:
+            return moves
+
+        threats = board.patterns.threats
+        weights = Player.THREAT_WEIGHTS[board.ci]
+        killers = self.killers.get(len(board.move_history), ())
+        history = self.history
+        ci = board.ci
+
+        def score(move):
+            if move == first:
+                return (Player.WIN << 2, 0)
+            value = weights[threats(move[0] * Pente.STRIDE + move[1])]
+            if move in killers:
+                value += Player.KILLER
+            return (value, history.get((ci, move), 0))
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def record_cutoff(self, move, depth):
+        killers = self.killers.setdefault(len(self.board.move_history), [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        key = (self.board.ci, move)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+    def store(self, alpha, beta, depth, value, move):
+        if value <= alpha:
+            bound = TranspositionTable.UPPER
+        elif value >= beta:
+            bound = TranspositionTable.LOWER
+        else:
+            bound = TranspositionTable.EXACT
+        self.table.store(self.board.hash, depth, bound, value, move)
+
     def alpha_beta_max(self, alpha, beta, depth):
+        if self.deadline is not None and perf_counter() > self.deadline:
+            raise SearchTimeout()
         if self.board.check_game_end():
             return (float("inf"), None) if self.board.winner == self.ci else (float("-inf"), None)
+        result, table_move = self.probe(alpha, beta, depth)
+        if result is not None:
+            return result
         if not depth:
-            return (self.eval(), self.board.move_history[-1])
+            value = self.eval()
+            self.table.store(self.board.hash, 0, TranspositionTable.EXACT, value, None)
+            return (value, self.board.move_history[-1])
 
         best_move = None
         best_value = float("-inf")
+        alpha_start = alpha
 
-        for move in self.board.get_valid_moves():
+        for move in self.ordered_moves(table_move):
             self.board.make_move(move)
             value, _ = self.alpha_beta_min(alpha, beta, depth - 1)
             self.board.unmake_move()
@@ -327,22 +904,32 @@ class Player:
                 best_move = move
 
             if value >= beta:
-                return value, best_move
+                self.record_cutoff(move, depth)
+                break
 
             alpha = max(alpha, value)
 
+        self.store(alpha_start, beta, depth, best_value, best_move)
         return best_value, best_move
 
     def alpha_beta_min(self, alpha, beta, depth):
+        if self.deadline is not None and perf_counter() > self.deadline:
+            raise SearchTimeout()
         if self.board.check_game_end():
             return (float("inf"), None) if self.board.winner == self.ci else (float("-inf"), None)
+        result, table_move = self.probe(alpha, beta, depth)
+        if result is not None:
+            return result
         if not depth:
-            return (self.eval(), self.board.move_history[-1])
+            value = self.eval()
+            self.table.store(self.board.hash, 0, TranspositionTable.EXACT, value, None)
+            return (value, self.board.move_history[-1])
 
         best_move = None
         best_value = float("inf")
+        beta_start = beta
 
-        for move in self.board.get_valid_moves():
+        for move in self.ordered_moves(table_move):
             self.board.make_move(move)
             value, _ = self.alpha_beta_max(alpha, beta, depth - 1)
             self.board.unmake_move()
@@ -352,316 +939,29 @@ class Player:
                 best_move = move
 
             if value <= alpha:
-                return value, best_move
+                self.record_cutoff(move, depth)
+                break
 
             beta = min(beta, value)
 
+        self.store(alpha, beta_start, depth, best_value, best_move)
         return best_value, best_move
 
     # check for x-pieces in a row
     def heuristic1(self):
-        max = 0
-        for i in range(Pente.BOARD_SIZE):
-            for j in range(Pente.BOARD_SIZE):
-                # skip occupied intersections
-                if self.board.board[i][j] != '.':
-                    continue
-                # check for bounds
-                # diagonal /
-                count = 0
-                # upper diagonal
-                if ((i-4) > -1 and (i-4) < Pente.BOARD_SIZE) and ((j+4) > -1 and (j+4) < Pente.BOARD_SIZE):
-                    for k in range(1, 5):
-                        if self.board.board[i-k][j+k] == self.oci:
-                            break
-                        if self.board.board[i-k][j+k] == self.ci:
-                            count += 1
-                # lower diagonal
-                if ((i+4) > -1 and (i+4) < Pente.BOARD_SIZE) and ((j-4) > -1 and (j-4) < Pente.BOARD_SIZE):
-                    for k in range(1, 5):
-                        if self.board.board[i+k][j-k] == self.oci:
-                            break
-                        if self.board.board[i+k][j-k] == self.ci:
-                            count += 1
-                if count > max:
-                    max = count
-
-                # diagonal \
-                count = 0
-                # upper diagonal
-                if ((i-4) > -1 and (i-4) < Pente.BOARD_SIZE) and ((j-4) > -1 and (j-4) < Pente.BOARD_SIZE):
-                    for k in range(1, 5):
-                        if self.board.board[i-k][j-k] == self.oci:
-                            break
-                        if self.board.board[i-k][j-k] == self.ci:
-                            count += 1
-                # lower diagonal
-                if ((i+4) > -1 and (i+4) < Pente.BOARD_SIZE) and ((j+4) > -1 and (j+4) < Pente.BOARD_SIZE):
-                    for k in range(1, 5):
-                        if self.board.board[i+k][j+k] == self.oci:
-                            break
-                        if self.board.board[i+k][j+k] == self.ci:
-                            count += 1
-                if count > max:
-                    max = count
-
-                # vertical |
-                count = 0
-                # upper
-                if i-4 > -1:
-                    for k in range(1, 5):
-                        if self.board.board[i-k][j] == self.oci:
-                            break
-                        if self.board.board[i-k][j] == self.ci:
-                            count += 1
-                # lower
-                if i+4 < Pente.BOARD_SIZE:
-                    for k in range(1, 5):
-                        if self.board.board[i+k][j] == self.oci:
-                            break
-                        if self.board.board[i+k][j] == self.ci:
-                            count += 1
-                if count > max:
-                    max = count
-
-                # horizontal
-                count = 0
-                # right
-                if j+4 < Pente.BOARD_SIZE:
-                    for k in range(1, 5):
-                        if self.board.board[i][j+k] == self.oci:
-                            break
-                        if self.board.board[i][j+k] == self.ci:
-                            count += 1
-                # left
-                if j-4 > -1:
-                    for k in range(1, 5):
-                        if self.board.board[i][j-k] == self.oci:
-                            break
-                        if self.board.board[i][j-k] == self.ci:
-                            count += 1
-                if count > max:
-                    max = count
-        return max
+        return self.board.patterns.longest(self.ci)
 
     # block enemy capture
     def heuristic2(self):
-        ec_count = 0
-        for x in range(Pente.BOARD_SIZE):
-            for y in range(Pente.BOARD_SIZE):
-                if y > 2 and \
-                        self.board.board[x][y] == '.' and \
-                        self.board.board[x][y-1] == self.ci \
-                        and self.board.board[x][y-2] == self.ci \
-                        and self.board.board[x][y-3] == self.oci:
-                    ec_count += 2
-
-                if y < Pente.BOARD_SIZE - 3 and \
-                        self.board.board[x][y] == '.' and \
-                        self.board.board[x][y+1] == self.ci \
-                        and self.board.board[x][y+2] == self.ci \
-                        and self.board.board[x][y+3] == self.oci:
-                    ec_count += 2
-
-                # vertical
-                if x > 2 and \
-                        self.board.board[x][y] == '.' and \
-                        self.board.board[x-1][y] == self.ci \
-                        and self.board.board[x-2][y] == self.ci \
-                        and self.board.board[x-3][y] == self.oci:
-                    ec_count += 2
-
-                if x < Pente.BOARD_SIZE - 3 and \
-                        self.board.board[x][y] == '.' and \
-                        self.board.board[x+1][y] == self.ci \
-                        and self.board.board[x+2][y] == self.ci \
-                        and self.board.board[x+3][y] == self.oci:
-                    ec_count += 2
-
-                # check diagonal captures
-                if (x > 2 and y > 2 and
-                        self.board.board[x][y] == '.' and
-                        self.board.board[x-1][y-1] == self.ci and
-                        self.board.board[x-2][y-2] == self.ci and
-                        self.board.board[x-3][y-3] == self.oci):
-                    ec_count += 2
-
-                if (x < Pente.BOARD_SIZE - 3 and y < Pente.BOARD_SIZE - 3 and
-                        self.board.board[x][y] == '.' and
-                        self.board.board[x+1][y+1] == self.ci and
-                        self.board.board[x+2][y+2] == self.ci and
-                        self.board.board[x+3][y+3] == self.oci):
-                    ec_count += 2
-
-                # check other diagonal captures
-                if (x > 2 and y < Pente.BOARD_SIZE - 3 and
-                        self.board.board[x][y] == '.' and
-                        self.board.board[x-1][y+1] == self.ci and
-                        self.board.board[x-2][y+2] == self.ci and
-                        self.board.board[x-3][y+3] == self.oci):
-                    ec_count += 2
-
-                if (x < Pente.BOARD_SIZE - 3 and y < Pente.BOARD_SIZE - 3 and
-                        self.board.board[x][y] == '.' and
-                        self.board.board[x+1][y-1] == self.ci and
-                        self.board.board[x+2][y-2] == self.ci and
-                        self.board.board[x+3][y-3] == self.oci):
-                    ec_count += 2
-
-        return ec_count
+        return 2 * self.board.patterns.setups[self.ci]
 
     # check for opponent getting x in a row
     def heuristic3(self):
-        max = 0
-        for i in range(Pente.BOARD_SIZE):
-            for j in range(Pente.BOARD_SIZE):
-                # skip occupied intersections
-                if self.board.board[i][j] != '.':
-                    continue
-                # check for bounds
-                # diagonal /
-                count = 0
-                # upper diagonal
-                if ((i-4) > -1 and (i-4) < Pente.BOARD_SIZE) and ((j+4) > -1 and (j+4) < Pente.BOARD_SIZE):
-                    for k in range(1, 5):
-                        if self.board.board[i-k][j+k] == self.ci:
-                            break
-                        if self.board.board[i-k][j+k] == self.oci:
-                            count += 1
-                # lower diagonal
-                if ((i+4) > -1 and (i+4) < Pente.BOARD_SIZE) and ((j-4) > -1 and (j-4) < Pente.BOARD_SIZE):
-                    for k in range(1, 5):
-                        if self.board.board[i+k][j-k] == self.ci:
-                            break
-                        if self.board.board[i+k][j-k] == self.oci:
-                            count += 1
-                if count > max:
-                    max = count
-
-                # diagonal \
-                count = 0
-                # upper diagonal
-                if ((i-4) > -1 and (i-4) < Pente.BOARD_SIZE) and ((j-4) > -1 and (j-4) < Pente.BOARD_SIZE):
-                    for k in range(1, 5):
-                        if self.board.board[i-k][j-k] == self.ci:
-                            break
-                        if self.board.board[i-k][j-k] == self.oci:
-                            count += 1
-                # lower diagonal
-                if ((i+4) > -1 and (i+4) < Pente.BOARD_SIZE) and ((j+4) > -1 and (j+4) < Pente.BOARD_SIZE):
-                    for k in range(1, 5):
-                        if self.board.board[i+k][j+k] == self.ci:
-                            break
-                        if self.board.board[i+k][j+k] == self.oci:
-                            count += 1
-                if count > max:
-                    max = count
-
-                # vertical |
-                count = 0
-                # upper
-                if i-4 > -1:
-                    for k in range(1, 5):
-                        if self.board.board[i-k][j] == self.ci:
-                            break
-                        if self.board.board[i-k][j] == self.oci:
-                            count += 1
-                # lower
-                if i+4 < Pente.BOARD_SIZE:
-                    for k in range(1, 5):
-                        if self.board.board[i+k][j] == self.ci:
-                            break
-                        if self.board.board[i+k][j] == self.oci:
-                            count += 1
-                if count > max:
-                    max = count
-
-                # horizontal
-                count = 0
-                # rightc
-                if j+4 < Pente.BOARD_SIZE:
-                    for k in range(1, 5):
-                        if self.board.board[i][j+k] == self.ci:
-                            break
-                        if self.board.board[i][j+k] == self.oci:
-                            count += 1
-                # left
-                if j-4 > -1:
-                    for k in range(1, 5):
-                        if self.board.board[i][j-k] == self.ci:
-                            break
-                        if self.board.board[i][j-k] == self.oci:
-                            count += 1
-                if count > max:
-                    max = count
-
-        return max
+        return self.board.patterns.longest(self.oci)
 
     # encourage own capture
     def heuristic4(self):
-        c_count = 0
-        for x in range(Pente.BOARD_SIZE):
-            for y in range(Pente.BOARD_SIZE):
-                if y > 2 and \
-                        self.board.board[x][y] == '.' and \
-                        self.board.board[x][y-1] == self.oci \
-                        and self.board.board[x][y-2] == self.oci \
-                        and self.board.board[x][y-3] == self.ci:
-                    c_count += 2
-
-                if y < Pente.BOARD_SIZE - 3 and \
-                        self.board.board[x][y] == '.' and \
-                        self.board.board[x][y+1] == self.oci \
-                        and self.board.board[x][y+2] == self.oci \
-                        and self.board.board[x][y+3] == self.ci:
-                    c_count += 2
-
-                # vertical
-                if x > 2 and \
-                        self.board.board[x][y] == '.' and \
-                        self.board.board[x-1][y] == self.oci \
-                        and self.board.board[x-2][y] == self.oci \
-                        and self.board.board[x-3][y] == self.ci:
-                    c_count += 2
-
-                if x < Pente.BOARD_SIZE - 3 and \
-                        self.board.board[x][y] == '.' and \
-                        self.board.board[x+1][y] == self.oci \
-                        and self.board.board[x+2][y] == self.oci \
-                        and self.board.board[x+3][y] == self.ci:
-                    c_count += 2
-
-                # check diagonal captures
-                if (x > 2 and y > 2 and
-                        self.board.board[x][y] == '.' and
-                        self.board.board[x-1][y-1] == self.oci and
-                        self.board.board[x-2][y-2] == self.oci and
-                        self.board.board[x-3][y-3] == self.ci):
-                    c_count += 2
-
-                if (x < Pente.BOARD_SIZE - 3 and y < Pente.BOARD_SIZE - 3 and
-                        self.board.board[x][y] == '.' and
-                        self.board.board[x+1][y+1] == self.oci and
-                        self.board.board[x+2][y+2] == self.oci and
-                        self.board.board[x+3][y+3] == self.ci):
-                    c_count += 2
-
-                # check other diagonal captures
-                if (x > 2 and y < Pente.BOARD_SIZE - 3 and
-                        self.board.board[x][y] == '.' and
-                        self.board.board[x-1][y+1] == self.oci and
-                        self.board.board[x-2][y+2] == self.oci and
-                        self.board.board[x-3][y+3] == self.ci):
-                    c_count += 2
-
-                if (x < Pente.BOARD_SIZE - 3 and y < Pente.BOARD_SIZE - 3 and
-                        self.board.board[x][y] == '.' and
-                        self.board.board[x+1][y-1] == self.oci and
-                        self.board.board[x+2][y-2] == self.oci and
-                        self.board.board[x+3][y-3] == self.ci):
-                    c_count += 2
-
-        return c_count
+        return 2 * self.board.patterns.setups[self.oci]
 
     # check for own cap pt2
     def heuristic5(self):
@@ -680,12 +980,23 @@ class Player:
 
 
 if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--processes", type=int, default=1,
+                        help="split the root moves of every search depth over this many worker processes")
+    parser.add_argument("--speedup", type=int, metavar="DEPTH",
+                        help="time a fixed DEPTH search serially and over --processes workers, then exit")
+    args = parser.parse_args()
+
     player = Player()
     player.read_input()
+    if args.speedup:
+        compare_speedup(player, args.speedup, max(2, args.processes))
+        raise SystemExit
     t1_start = process_time()
-    player.compute_move()
+    player.compute_move(args.processes)
     t1_stop = process_time()
     print("time: ", round(t1_stop - t1_start))
+    print("depth: ", player.depth_reached)
     if player.best_move:
         player.write_output()
         print(player.best_move)